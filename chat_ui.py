@@ -1,17 +1,22 @@
 import sys
 import uuid
 import asyncio
+import qasync
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QTextEdit, QLineEdit, QPushButton
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import QTextCursor
 from src.prompt_engineering.chaining import GradChaining
 from src.models.models import ConversationStatus
 import traceback as trackback
 
 
 class ChatWindow(QWidget):
+    # Kết quả từ grad được đẩy về UI qua signal, không gọi render trực tiếp
+    segment_ready = Signal(object)
+
     def __init__(self):
         super().__init__()
         self.grad = GradChaining()
@@ -21,9 +26,16 @@ class ChatWindow(QWidget):
 
         self.active_segment_id = None
 
+        # Trạng thái render incremental: chỉ append phần message mới
+        self._rendered_segment_id = None
+        self._rendered_count = 0
+        self._status_pos = None
+
+        # Lượt grad.invoke đang chạy; input mới sẽ cancel lượt cũ
+        self._current_task: asyncio.Task | None = None
+
         self._build_ui()
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
+        self.segment_ready.connect(self.render_segment)
 
     # -------------------------------------------------
     def _build_ui(self):
@@ -49,12 +61,22 @@ class ChatWindow(QWidget):
 
     # -------------------------------------------------
     def render_segment(self, segment):
-        self.chat_area.clear()
+        # Segment mới → bắt đầu lại transcript
+        if segment.segment_id != self._rendered_segment_id:
+            self.chat_area.clear()
+            self._rendered_segment_id = segment.segment_id
+            self._rendered_count = 0
+            self._status_pos = None
+
+        self._remove_status_footer()
 
-        for msg in segment.messages:
+        for msg in segment.messages[self._rendered_count:]:
             role = "You" if msg.role == "user" else "Agent"
             self.chat_area.append(f"<b>{role}:</b> {msg.content}")
+        self._rendered_count = len(segment.messages)
 
+        # Footer status luôn nằm cuối, được ghi đè ở lần render sau
+        self._status_pos = self.chat_area.document().characterCount() - 1
         self.chat_area.append(
             f"<hr><i>Status: {segment.status}</i>"
         )
@@ -63,13 +85,26 @@ class ChatWindow(QWidget):
             self.chat_area.verticalScrollBar().maximum()
         )
 
+    def _remove_status_footer(self):
+        if self._status_pos is None:
+            return
+
+        cursor = QTextCursor(self.chat_area.document())
+        cursor.setPosition(self._status_pos)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        self._status_pos = None
+
     # -------------------------------------------------
-    def send_message(self):
+    @qasync.asyncSlot()
+    async def send_message(self):
         text = self.input_box.text().strip()
         if not text:
             return
         self.input_box.clear()
 
+        await self._cancel_current_task()
+
         try:
             # -----------------------------------------
             # CHƯA CÓ SEGMENT → TẠO MỚI
@@ -77,11 +112,9 @@ class ChatWindow(QWidget):
             if self.active_segment_id is None:
                 self.active_segment_id = f"seg-{uuid.uuid4().hex[:8]}"
 
-                segment = self.loop.run_until_complete(
-                    self.grad.invoke(
-                        segment_id=self.active_segment_id,
-                        user_request=text
-                    )
+                segment = await self._run_grad(
+                    segment_id=self.active_segment_id,
+                    user_request=text
                 )
 
             # -----------------------------------------
@@ -97,33 +130,63 @@ class ChatWindow(QWidget):
                         )
                         return
 
-                    segment = self.loop.run_until_complete(
-                        self.grad.invoke(
-                            segment_id=self.active_segment_id,
-                            hitl_decision=text.lower()
-                        )
+                    segment = await self._run_grad(
+                        segment_id=self.active_segment_id,
+                        hitl_decision=text.lower()
                     )
 
                 else:
                     # segment đã DONE / FAILED → tạo segment mới
                     self.active_segment_id = f"seg-{uuid.uuid4().hex[:8]}"
-                    segment = self.loop.run_until_complete(
-                        self.grad.invoke(
-                            segment_id=self.active_segment_id,
-                            user_request=text
-                        )
+                    segment = await self._run_grad(
+                        segment_id=self.active_segment_id,
+                        user_request=text
                     )
 
-            self.render_segment(segment)
+            self.segment_ready.emit(segment)
+
+        except asyncio.CancelledError:
+            # Bị input mới thay thế → lượt mới sẽ render kết quả của nó
+            pass
 
         except Exception as e:
             trackback.print_exc()
             self.chat_area.append(f"<b>Agent:</b> Error: {e}")
 
+    async def _run_grad(self, **kwargs):
+        self._current_task = asyncio.create_task(self.grad.invoke(**kwargs))
+        return await self._current_task
+
+    async def _cancel_current_task(self):
+        """
+        Cancel lượt invoke còn đang chạy và chờ nó dừng hẳn.
+        Segment bị bỏ dở vẫn ở RUNNING nên input mới sẽ mở segment mới.
+        """
+        task = self._current_task
+        if task is None or task.done():
+            return
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
 
 # -------------------------------------------------
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+
+    # Qt event loop và asyncio dùng chung 1 loop → UI không bị đứng khi chờ LLM
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+
+    # Dừng loop khi app thoát để các task còn treo được dọn sạch
+    app_close_event = asyncio.Event()
+    app.aboutToQuit.connect(app_close_event.set)
+
     window = ChatWindow()
     window.show()
-    sys.exit(app.exec())
+
+    with loop:
+        loop.run_until_complete(app_close_event.wait())
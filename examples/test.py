@@ -4,9 +4,6 @@ if __name__ == "__main__":
     base_tool = BaseTool()
     base_tool.auto_discover()
     print("Discovered Tools Grouped by Category:")
-    tools = []
-    tools.append(base_tool.get_tool(name="create_file"))
-    tools.append(base_tool.get_tool(name="add"))
-    tools.append(base_tool.get_tool(name="divide"))
+    tools = base_tool.get_tools(["create_file", "add", "divide"])
     print(tools)
     print(base_tool.get_tools_grouped_str_by_callables(tools=tools))
\ No newline at end of file
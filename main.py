@@ -10,31 +10,61 @@ from src.dispatcher.SOPStepDispatcher import SOPStepDispatcher
 from src.serializer.serializer import SmartSerializer
 from src.agent.simple_math_agent import SimpleMathAgent
 
+import argparse
 import asyncio
+import sys
+from typing import Optional
 
-async def main():
+async def setup_planner(llm, user_request: str):
+    """Planner là bước chậm nhất (LLM round-trip)."""
+    agent = PlannerAgent(llm=llm)
+    return await agent.invoke(user_request)
+
+
+def setup_agents(base_tool: BaseTool, llm_ollama):
+    """Khởi tạo + đăng ký tools cho các agent thực thi, không phụ thuộc vào plan."""
+    crud_agent = CRUDAgent(llm=llm_ollama)
+    simple_math_agent = SimpleMathAgent(llm=llm_ollama)
+    crud_agent.register_tool(tool=base_tool.get_callables_by_group(group_name="file"))
+    simple_math_agent.register_tool(tool=base_tool.get_callables_by_group(group_name="math"))
+    return [crud_agent, simple_math_agent]
+
+
+async def run_pipeline(base_tool: BaseTool, user_request: str):
+    """
+    Planner và việc dựng các agent chạy song song:
+    chỉ SOPStepDispatcher mới cần cả plan lẫn agents.
+    """
+    llm = GroqClient()
+    llm_ollama = OllamaClient()
+
+    # Đăng ký tools là code sync → chạy trong thread để overlap với planner
+    response, agents = await asyncio.gather(
+        setup_planner(llm, user_request),
+        asyncio.to_thread(setup_agents, base_tool, llm_ollama),
+    )
+
+    sop = SOPAgent(llm=llm)
+
+    sop_dispatcher = SOPStepDispatcher(sop_agent=sop, agents=agents)
+    sop_result = await sop_dispatcher.build_sop(plan=response)
+    if sop_result is not None:
+        sop_dispatcher.info("[PIPELINE] SOP built", sop=sop_result.model_dump(mode="json"))
+    return sop_result
+
+
+async def main(user_request: Optional[str] = None) -> int:
     base_tool = BaseTool()
     base_tool.auto_discover(package_name="src.tools.group")
     print(base_tool.get_all_tools_grouped())
-    # llm = GroqClient()
-    # llm_ollama = OllamaClient()
-    # agent = PlannerAgent(llm=llm)
-    # response = await agent.invoke("Lấy kết quả từ file F:/result.txt so sánh có bằng số 67 nếu bằng thì hãy tạo ra file mới F:/troll_2.txt với nội dung 'sybau'.")
-
-    # crud_agent = CRUDAgent(llm=llm_ollama)
-    # simple_math_agent = SimpleMathAgent(llm=llm_ollama)
-    # crud_agent.register_tool(tool=base_tool.get_tools_by_group(group_name="file"))
-    # simple_math_agent.register_tool(tool=base_tool.get_tools_by_group(group_name="math"))
-
-    # sop = SOPAgent(llm=llm)
-    # sop_dispatcher = SOPStepDispatcher(sop_agent=sop, agents=[crud_agent, simple_math_agent])
-    # sop_result = await sop_dispatcher.build_sop(plan=response)
-    # print("SOP RESULT: ", sop_result)
-    # print(agent.list_tools())
+    # Pipeline (gọi LLM thật) chỉ chạy khi truyền request qua argv
+    if user_request is None:
+        return 0
+    # Lỗi build SOP đã được SOPStepDispatcher log
+    sop_result = await run_pipeline(base_tool, user_request)
     # agent.safe_call_tool(name="create_file", filename="F:/namdeptraiqua", content="Nam đẹp trai quá", type_file=".txt")
-    # if sop_result is None:
-    #     print("SOP generation failed.")
-    #     return
+    if sop_result is None:
+        return 1
 #     data = {
 #   "steps": [
 #     {
@@ -130,7 +160,21 @@ async def main():
     # exec_agent.register_agent(agent=crud_agent)
     # exec_agent.register_agent(agent=simple_math_agent)
     # print(await exec_agent.run_sop(sop_result))
+    return 0
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Liệt kê tools; truyền request để chạy planner → SOP.")
+    parser.add_argument("request", nargs="?", help="User request cho pipeline planner → SOP")
+    args = parser.parse_args()
+
+    try:
+        import uvloop
+    except ImportError:
+        # Windows / chưa cài uvloop → asyncio loop mặc định
+        uvloop = None
+
+    if uvloop is not None:
+        sys.exit(uvloop.run(main(args.request)))
+    else:
+        sys.exit(asyncio.run(main(args.request)))
@@ -6,6 +6,8 @@ Usage: python run_log_viewer.py [--port 8000] [--host 0.0.0.0]
 import argparse
 import uvicorn
 
+from src.web.log_viewer import uvicorn_options
+
 
 def main():
     parser = argparse.ArgumentParser(description="Run Log Viewer Web Interface")
@@ -22,7 +24,8 @@ def main():
         "src.web.log_viewer:app",
         host=args.host,
         port=args.port,
-        reload=args.reload
+        reload=args.reload,
+        **uvicorn_options()
     )
 
 
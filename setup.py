@@ -42,6 +42,9 @@ setuptools.setup(
         "langchain",
         "langchain-groq",
         "langchain-ollama",
+        "orjson",
+        "httpx",
+        'uvloop>=0.18; platform_system != "Windows"',
     ],
 
     classifiers=[
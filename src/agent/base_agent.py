@@ -1,16 +1,25 @@
 from __future__ import annotations
 import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Callable, Iterable, List, Optional, Union
+from typing import Any, Awaitable, Dict, Callable, Iterable, List, Optional, Tuple, Union
 from src.utils.logger import LoggerMixin
 from src.tools.base_tool import BaseTool
 from src.llm.base import BaseClient
 from src.models.models import Response
 from langchain.agents import create_agent
 from src.handler.error_handler import ErrorHandler
+from src.utils.helper import try_json_loads
+import itertools
 import json
+import weakref
 from src.middleware.agent_middleware import AgentMiddleware
 
+# id(llm) → {schema: llm.with_structured_output(schema)}; entry tự xoá khi llm bị GC
+_STRUCTURED_LLMS: Dict[int, Dict[type, Any]] = {}
+
+# Mỗi lần tools của bất kỳ agent nào thay đổi lấy 1 version mới, không bao giờ trùng
+_TOOLS_VERSIONS = itertools.count(1)
+
 class BaseAgent(LoggerMixin, ABC):
     """
     BaseAgent chuẩn:
@@ -29,18 +38,23 @@ class BaseAgent(LoggerMixin, ABC):
         log_dir: str = "logs"
     ):
         super().__init__(name or self.__class__.__name__, log_dir)
-        self.llm = llm._create_client()
-        self._tools: List[Callable] = []
-        self.agent = self._create_agent()
+        # Client provider dùng chung giữa các agent (không tạo HTTP pool riêng)
+        self.llm = llm.get_or_create_client()
+        # tool_name → tool_func (lookup O(1))
+        self._tools: Dict[str, Callable] = {}
+        # Agent / mô tả tools được build lazy và cache, reset khi tools thay đổi
+        self._agent = None
+        self._str_cache: Optional[str] = None
+        self._tool_desc_cache: Optional[Dict[str, str]] = None
+        self.tools_version = next(_TOOLS_VERSIONS)
         self.description = description
         self.middleware = List[AgentMiddleware]
-        self.error_handler = ErrorHandler()
+        self.error_handler = ErrorHandler.shared()
 
         if tools:
-            for t in tools:
-                self.register_tool(t)
-                
-            self.logger.info(
+            self.register_tools(tools)
+
+            self.info(
                 f"{self.__class__.__name__} initialized with tools: {list(self._tools.keys())}"
             )
 
@@ -51,79 +65,204 @@ class BaseAgent(LoggerMixin, ABC):
         - string (ref in BaseTool.registry)
         - iterable (list/tuple/set) of callables or strings
         """
-        if isinstance(tool, List):
-            for item in tool:
-                func = BaseTool.get_tool(item)
-                if func is None:
-                    self.error(f"Tool named '{tool}' not found in BaseTool.registry")
-                    raise ValueError(f"Tool named '{tool}' not found in BaseTool.registry")
-                self._tools.append(func)
-            self.info(f"List tools: '{tool}' is registered")
+        if isinstance(tool, (list, tuple, set)):
+            self.register_tools(tool)
             return
 
-        # case: tool name string
+        func = self._resolve_tool(tool)
+        self._tools[func.__name__] = func
+        self._invalidate_caches()
+        if isinstance(tool, str):
+            self.info(f"Tool named '{tool}' found in BaseTool.registry is registered")
+
+    def register_tools(self, tools: Iterable[Union[Callable, str]]):
+        """
+        Đăng ký nhiều tool 1 lần: resolve toàn bộ trước (lỗi → không tool nào
+        được thêm), sau đó cập nhật _tools trong 1 lượt.
+        """
+        resolved = {func.__name__: func for func in map(self._resolve_tool, tools)}
+        self._tools.update(resolved)
+        self._invalidate_caches()
+        self.info(f"List tools: {list(resolved)} is registered")
+
+    def _resolve_tool(self, tool: Union[Callable, str]) -> Callable:
+        """String → tra BaseTool.registry; callable → giữ nguyên."""
         if isinstance(tool, str):
             func = BaseTool.get_tool(tool)
             if func is None:
                 self.error(f"Tool named '{tool}' not found in BaseTool.registry")
                 raise ValueError(f"Tool named '{tool}' not found in BaseTool.registry")
-            self._tools.append(func)
-            self.info(f"Tool named '{tool}' found in BaseTool.registry is registered")
-            return
+            return func
 
-        # case: callable tool
         if callable(tool):
-            self._tools.append(tool)
-            return
+            return tool
 
         raise TypeError("Tool must be callable, string, or list of them")
     
+    def _invalidate_caches(self):
+        self._agent = None
+        self._str_cache = None
+        self._tool_desc_cache = None
+        self.tools_version = next(_TOOLS_VERSIONS)
+
     def register_tools_by_group(self, category: str):
         """
         Docstring for register_tools_by_group
         
         category: Tên group tool được cũng cấp sẵn trong class BaseTool
         """
-        tools = BaseTool.get_tools_by_group(group_name=category)
-        [self._tools.append(tool) for tool in tools]
-        self.info(f"Registered tool successfully: {tools}")
+        self.register_tools(BaseTool.get_callables_by_group(category))
         
-    def get_tools(self):
-        return self._tools
+    def get_tools(self) -> List[Callable]:
+        return list(self._tools.values())
 
 
     def list_tools(self) -> List[str]:
         """
         Trả về danh sách tên tool trong _tools.
-        _tools: List[Callable]
         """
-        return [tool.__name__ for tool in self._tools if callable(tool)]
+        return list(self._tools)
     
     def get_tool_descriptions(self) -> Dict[str, str]:
-        
-        return {
-            tool.__name__: (tool.__doc__ or "No description available.")
-            for tool in self._tools
-            if callable(tool)
-        }
+        if self._tool_desc_cache is None:
+            self._tool_desc_cache = {
+                name: (tool.__doc__ or "No description available.")
+                for name, tool in self._tools.items()
+            }
+        return self._tool_desc_cache
 
 
     def get_tool(self, name: str) -> Optional[Callable]:
         """
         Lấy tool theo tên từ _tools.
-        _tools: List[Callable]
         """
-        for tool in self._tools:
-            if callable(tool) and tool.__name__ == name:
-                return tool
-        return None
+        return self._tools.get(name)
+
+    @property
+    def agent(self):
+        """Agent memoized; đăng ký thêm tool sẽ reset để build lại lần sau."""
+        if self._agent is None:
+            self._agent = self._create_agent()
+        return self._agent
 
     def _create_agent(self):
         return create_agent(
             model=self.llm,
-            tools=self._tools,
+            tools=list(self._tools.values()),
         )
     
+    @property
+    def llm_signature(self) -> Tuple[str, Any, Any]:
+        """
+        (provider, model, temperature) của LLM — đưa vào cache key của các call LLM
+        để agent dùng model/provider khác không dùng lại kết quả của nhau.
+        """
+        llm = self.llm
+        model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+        return (type(llm).__name__, model, getattr(llm, "temperature", None))
+
+    def structured_llm(self, schema: type):
+        """
+        llm.with_structured_output(schema) dùng chung cho mọi agent cùng client:
+        schema → JSON schema / tool spec chỉ build 1 lần mỗi (client, schema).
+        """
+        key = id(self.llm)
+        bound = _STRUCTURED_LLMS.get(key)
+        if bound is None:
+            try:
+                weakref.finalize(self.llm, _STRUCTURED_LLMS.pop, key, None)
+            except TypeError:
+                # Client không weakref được → không cache (tránh trùng id sau khi GC)
+                return self.llm.with_structured_output(schema)
+            bound = _STRUCTURED_LLMS[key] = {}
+
+        runnable = bound.get(schema)
+        if runnable is None:
+            runnable = bound[schema] = self.llm.with_structured_output(schema)
+        return runnable
+
+    async def _hedged(
+        self,
+        attempt: Callable[[], Awaitable[Any]],
+        attempts: int,
+        hedge_delay: float,
+    ) -> Any:
+        """
+        Hedged retries: chạy attempt đầu; attempt tiếp theo chỉ được bắn khi
+        attempt trước lỗi hoặc quá hedge_delay giây chưa xong (chạy song song).
+        Trả về kết quả thành công đầu tiên và cancel các attempt còn lại.
+        Hết lượt mà vẫn lỗi → raise lỗi cuối cùng.
+        """
+        pending: set = set()
+        launched = 0
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal launched
+            launched += 1
+            self.info(f"[{self.name}] Attempt {launched}")
+            pending.add(asyncio.create_task(attempt()))
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if launched < attempts else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                # Attempt đang chạy quá chậm → bắn thêm 1 attempt song song
+                if not done:
+                    launch()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    self.warning(f"[{self.name}] Error: {last_error}")
+                    if launched < attempts:
+                        launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_error
+
+    async def _astream_json(self, prompt) -> Tuple[str, Any]:
+        """
+        Stream output của LLM, dừng ngay khi đã nhận đủ 1 JSON object hoàn chỉnh
+        (không chờ model sinh hết phần giải thích phía sau).
+        Trả về (raw_text, parsed_json | None).
+        """
+        decoder = json.JSONDecoder()
+        chunks: List[str] = []
+        stream = self.llm.astream(prompt)
+        try:
+            async for chunk in stream:
+                piece = chunk.content if isinstance(chunk.content, str) else ""
+                chunks.append(piece)
+                # Object chỉ có thể vừa đóng khi chunk chứa "}"
+                if "}" not in piece:
+                    continue
+
+                text = "".join(chunks)
+                start = text.find("{")
+                if start == -1:
+                    continue
+                try:
+                    obj, _ = decoder.raw_decode(text, start)
+                except ValueError:
+                    continue
+                return text.strip(), obj
+        finally:
+            await stream.aclose()
+
+        raw = "".join(chunks).strip()
+        return raw, try_json_loads(raw)
+
     @abstractmethod
     def build_prompt(self, **kwargs):
         raise NotImplementedError
@@ -133,7 +272,11 @@ class BaseAgent(LoggerMixin, ABC):
         raise NotImplementedError
     
     def __str__(self):
-        return BaseTool.get_tools_grouped_str_by_callables(tools=self._tools)
+        if self._str_cache is None:
+            self._str_cache = BaseTool.get_tools_grouped_str_by_callables(
+                tools=list(self._tools.values()), agent_name=self.name
+            )
+        return self._str_cache
     
     def __repr__(self):
         return self.__str__()
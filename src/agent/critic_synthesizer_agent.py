@@ -1,9 +1,98 @@
 from src.agent.base_agent import BaseAgent
 from langchain_core.prompts import ChatPromptTemplate
 from src.models.models import SynthesizedCriticReport
+from src.utils.async_cache import async_memoize, stable_hash
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+
+# Prompt templates tĩnh, compile 1 lần lúc import
+
+_REVIEW_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+    You are a Review Agent.
+    Your job is to evaluate the SOP and Execution result.
+    Focus on:
+    - What went wrong
+    - Why it happened
+    - What parts of the SOP may have caused it
+    Write a structured critique in plain text.
+                """,
+        ),
+        (
+            "human",
+            """
+    User Request:
+    {user_request}
+
+    SOP:
+    {sop}
+
+    Execution Output after running the SOPw:
+    {execution}
+
+    Write your detailed critique now.
+                """,
+        ),
+    ]
+)
+
+_ANALYSIS_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+            You are an Analysis Agent.
+            Given a critique, extract:
+            - Key failure points
+            - Root causes
+            - Logical issues from SOP design
+            """,
+        ),
+        ("user", "Critique:\n{critique}\n\nExtract the insights."),
+    ]
+)
+
+_SYNTHESIS_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+            You are a Critic Synthesizer Agent.
+            Combine:
+            - Original request
+            - SOP
+            - Execution result
+            - Extracted insights
+
+            Produce a JSON strictly following this structure:
+
+            {{
+            "summary": "...",
+            "key_failures": ["...", "..."],
+            "improvement_advice": ["...", "..."],
+            "risk_level": "low | medium | high | critical"
+            }}
+                        """,
+                            ),
+                            (
+                                "user",
+                                """
+            User request:
+            {user_request}
+
+            Extracted insights:
+            {insights}
+
+            Generate the JSON now.
+            """,
+        ),
+    ]
+)
 
 
 class CriticSynthesizerAgent(BaseAgent):
@@ -21,115 +110,41 @@ class CriticSynthesizerAgent(BaseAgent):
 
     def __init__(self, llm, name="CriticSynthesizerAgent", log_dir="logs"):
         super().__init__(llm, None, name, "", log_dir)
-        
+        # Prompt/chain chỉ compile 1 lần, invoke chỉ còn ainvoke
+        self._review = self._review_chain()
+        self._analysis = self._analysis_chain()
+        self._synth = self._synthesis_chain()
+        self._full_chain = self.build_full_chain()
+
     def build_prompt(self, **kwargs):
         return super().build_prompt(**kwargs)
 
     def _review_chain(self):
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """
-            You are a Review Agent.
-            Your job is to evaluate the SOP and Execution result.
-            Focus on:
-            - What went wrong
-            - Why it happened
-            - What parts of the SOP may have caused it
-            Write a structured critique in plain text.
-                        """,
-                ),
-                (
-                    "human",
-                    """
-            User Request:
-            {user_request}
-
-            SOP:
-            {sop}
-
-            Execution Output after running the SOPw:
-            {execution}
-
-            Write your detailed critique now.
-                        """,
-                ),
-            ]
-        )
-        return prompt | self.llm | StrOutputParser()
+        return _REVIEW_PROMPT | self.llm | StrOutputParser()
 
     def _analysis_chain(self):
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """
-                    You are an Analysis Agent.
-                    Given a critique, extract:
-                    - Key failure points
-                    - Root causes
-                    - Logical issues from SOP design
-                    """,
-                ),
-                ("user", "Critique:\n{critique}\n\nExtract the insights."),
-            ]
-        )
-        return prompt | self.llm | StrOutputParser()
+        return _ANALYSIS_PROMPT | self.llm | StrOutputParser()
 
     def _synthesis_chain(self):
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """
-                    You are a Critic Synthesizer Agent.
-                    Combine:
-                    - Original request
-                    - SOP
-                    - Execution result
-                    - Extracted insights
-
-                    Produce a JSON strictly following this structure:
-
-                    {{
-                    "summary": "...",
-                    "key_failures": ["...", "..."],
-                    "improvement_advice": ["...", "..."],
-                    "risk_level": "low | medium | high | critical"
-                    }}
-                                """,
-                                    ),
-                                    (
-                                        "user",
-                                        """
-                    User request:
-                    {user_request}
-
-                    Extracted insights:
-                    {insights}
-
-                    Generate the JSON now.
-                    """,
-                ),
-            ]
-        )
-
-        return prompt | self.llm.with_structured_output(SynthesizedCriticReport)
+        return _SYNTHESIS_PROMPT | self.structured_llm(SynthesizedCriticReport)
 
     def build_full_chain(self):
+        # review → analysis → synthesis phụ thuộc nhau, giữ 1 chain tuần tự
         return (
-            RunnablePassthrough.assign(critique=self._review_chain())
-            | RunnablePassthrough.assign(insights=self._analysis_chain())
-            | self._synthesis_chain()
+            RunnablePassthrough.assign(critique=self._review)
+            | RunnablePassthrough.assign(insights=self._analysis)
+            | self._synth
         )
 
+    @async_memoize(
+        key=lambda self, input_text, sop_result, execution_result: stable_hash(
+            self.llm_signature, input_text, sop_result, execution_result
+        )
+    )
     async def invoke(self, input_text: str, sop_result: Dict, execution_result: Dict):
         self.info("[CriticSynthesizer] Running reflection pipeline...")
 
-        chain = self.build_full_chain()
-
-        final = await chain.ainvoke(
+        final = await self._full_chain.ainvoke(
             {
                 "user_request": input_text,
                 "sop": sop_result,
@@ -138,5 +153,26 @@ class CriticSynthesizerAgent(BaseAgent):
         )
 
         self.info("[CriticSynthesizer] Done.")
-        print(type(final))
+        self.debug("[CriticSynthesizer] Final output", output_type=type(final).__name__)
         return final
+
+    async def invoke_batch(self, reports: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Chạy reflection cho nhiều report cùng lúc (chain.abatch → các LLM call song song).
+        Mỗi report: {"input_text": ..., "sop_result": ..., "execution_result": ...}
+        """
+        self.info("[CriticSynthesizer] Running batched reflection pipeline...", count=len(reports))
+
+        results = await self._full_chain.abatch(
+            [
+                {
+                    "user_request": r["input_text"],
+                    "sop": r["sop_result"],
+                    "execution": r["execution_result"],
+                }
+                for r in reports
+            ]
+        )
+
+        self.info("[CriticSynthesizer] Done.", count=len(results))
+        return results
@@ -1,14 +1,20 @@
 from src.agent.base_agent import BaseAgent
 from langchain_core.messages import HumanMessage, SystemMessage
-from src.tools.base_tool import BaseTool
-import json
 
-BaseTool.auto_discover()
 
+_SYSTEM_MESSAGE = SystemMessage(
+    content=(
+        "You are a File Management Assistant.\n"
+        "You can create, read, update, rename, copy and delete files.\n"
+        "If the user request requires using a tool, output VALID JSON with:\n"
+        "{ 'tool': '<tool_name>', 'params': {...} }\n"
+        "If no tool is needed (rare), you can reason directly."
+        "DO NOT EXPLAIN, just return JSON format like 'success': True/False. 'result': <your answer>."
+    )
+)
 
-class CRUDAgent(BaseAgent):
-    tools = BaseTool.list_tools()
 
+class CRUDAgent(BaseAgent):
     def __init__(
         self, llm, tools=None, name="CRUDAgent",
         description="Agent xử lý các công việc quản lý file",
@@ -22,16 +28,7 @@ class CRUDAgent(BaseAgent):
         params = kwargs.get("params", {})
 
         return [
-            SystemMessage(
-                content=(
-                    "You are a File Management Assistant.\n"
-                    "You can create, read, update, rename, copy and delete files.\n"
-                    "If the user request requires using a tool, output VALID JSON with:\n"
-                    "{ 'tool': '<tool_name>', 'params': {...} }\n"
-                    "If no tool is needed (rare), you can reason directly."
-                    "DO NOT EXPLAIN, just return JSON format like 'success': True/False. 'result': <your answer>."
-                )
-            ),
+            _SYSTEM_MESSAGE,
             HumanMessage(
                 content=f"Task: {query}\nParameters: {params}"
             )
@@ -45,12 +42,9 @@ class CRUDAgent(BaseAgent):
 
         prompt = self.build_prompt(query=query, params=params)
 
-        output = await self.llm.ainvoke(prompt)
-        raw = output.content.strip()
+        # Stream và parse ngay khi JSON tool-call hoàn chỉnh
+        raw, parsed = await self._astream_json(prompt)
 
         self.info(f"[CRUDAgent] Raw output: {raw}")
 
-        try:
-            return json.loads(raw)
-        except:
-            return raw
+        return parsed if parsed is not None else raw
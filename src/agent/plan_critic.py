@@ -1,58 +1,19 @@
 from __future__ import annotations
+import asyncio
+from typing import Dict, List
 from src.agent.base_agent import BaseAgent
 from langchain_core.prompts import ChatPromptTemplate
-from pydantic import BaseModel, Field
+from src.models.models import CriticFeedback
+from src.utils.async_cache import async_memoize
 import json
 
 
 # ============================================================
-# MODELS
+# PROMPT (compile 1 lần lúc import)
 # ============================================================
 
-class CriticIssue(BaseModel):
-    description: str = Field(..., description="Mô tả vấn đề phát hiện trong plan")
-    severity: str = Field(
-        ...,
-        description="Mức độ nghiêm trọng: none | low | medium | high | critical"
-    )
-    impact: str = Field(
-        ...,
-        description="Hậu quả hoặc rủi ro tiềm năng nếu vấn đề không được xử lý"
-    )
-
-
-class CriticFeedback(BaseModel):
-    score: int = Field(..., description="Điểm đánh giá tổng thể (0–100)")
-    issues: list[CriticIssue] = Field(..., description="Danh sách vấn đề được phát hiện")
-    summary: str = Field(..., description="Tóm tắt đánh giá + Pass/Fail")
-
-
-# ============================================================
-# PLAN CRITIC AGENT
-# ============================================================
-
-class PlanCriticAgent(BaseAgent):
-    """
-    PlanCriticAgent:
-    - Đánh giá Plan từ PlannerAgent
-    - Chấm điểm theo tiêu chí chất lượng: correctness, completeness, safety, clarity, feasibility
-    - Để đảm bảo an toàn tuyệt đối: score MUST be 100 to PASS
-    """
-
-    MAX_RETRY = 3
-
-    def __init__(self, llm, tools=None, name="PlanCriticAgent", description="", log_dir="logs"):
-        super().__init__(llm, tools, name, description, log_dir)
-
-    # ------------------------------------------------------------
-    # BUILD PROMPT
-    # ------------------------------------------------------------
-    def build_prompt(self, plan, query=None):
-
-        plan_str = "\n".join(f"{i+1}. {s}" for i, s in enumerate(plan.steps))
-
-        system_prompt = (
-            """You are a Plan Completeness Checker.
+_CRITIC_SYSTEM_PROMPT = (
+    """You are a Plan Completeness Checker.
 
             User request (task to achieve):
             {query}
@@ -82,44 +43,106 @@ class PlanCriticAgent(BaseAgent):
             "summary": "<PASS if score == 100 else FAIL>"
             }}
             """
-        )
+)
+
+_CRITIC_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", _CRITIC_SYSTEM_PROMPT),
+        ("human", "Evaluate the following plan:\n{plan_str}")
+    ]
+)
 
-        return ChatPromptTemplate.from_messages(
-            [
-                ("system", system_prompt),
-                ("human", "Evaluate the following plan:\n" + plan_str)
-            ]
-        ).partial(query=query)
+
+# ============================================================
+# PLAN CRITIC AGENT
+# ============================================================
+
+class PlanCriticAgent(BaseAgent):
+    """
+    PlanCriticAgent:
+    - Đánh giá Plan từ PlannerAgent
+    - Chấm điểm theo tiêu chí chất lượng: correctness, completeness, safety, clarity, feasibility
+    - Để đảm bảo an toàn tuyệt đối: score MUST be 100 to PASS
+    """
+
+    MAX_RETRY = 3
+    # Giây chờ attempt hiện tại trước khi bắn thêm attempt song song
+    HEDGE_DELAY = 8.0
+
+    def __init__(self, llm, tools=None, name="PlanCriticAgent", description="", log_dir="logs"):
+        super().__init__(llm, tools, name, description, log_dir)
+        # Prompt cố định, plan/query là input variables → chain build 1 lần
+        # LLM output mapped directly to CriticFeedback Pydantic model
+        self._chain = _CRITIC_PROMPT | self.structured_llm(CriticFeedback)
+
+    # ------------------------------------------------------------
+    # BUILD PROMPT
+    # ------------------------------------------------------------
+    @staticmethod
+    def _format_plan(plan) -> str:
+        return "\n".join(f"{i+1}. {s}" for i, s in enumerate(plan.steps))
+
+    def build_prompt(self, plan, query=None):
+        return _CRITIC_PROMPT.partial(query=query, plan_str=self._format_plan(plan))
 
 
     # ------------------------------------------------------------
     # CHAIN
     # ------------------------------------------------------------
-    def chain(self, plan, query=None):
-        prompt = self.build_prompt(plan, query)
-        # LLM output mapped directly to CriticFeedback Pydantic model
-        return prompt | self.llm.with_structured_output(CriticFeedback)
+    def chain(self):
+        return self._chain
 
     # ------------------------------------------------------------
     # INVOKE (retry + structured validate)
     # ------------------------------------------------------------
+    # Cùng model + plan + query → dùng lại feedback, chỉ cache kết quả thành công
+    @async_memoize(
+        key=lambda self, plan, query=None: (self.llm_signature, tuple(plan.steps), query),
+        cache_if=lambda resp: resp.get("success"),
+    )
     async def invoke(self, plan, query=None):
+        chain = self.chain()
+        inputs = {"query": query, "plan_str": self._format_plan(plan)}
+
+        try:
+            # Retry dạng hedged: attempt sau chỉ chạy khi attempt trước lỗi/chậm
+            feedback = await self._hedged(
+                lambda: chain.ainvoke(inputs),
+                attempts=self.MAX_RETRY,
+                hedge_delay=self.HEDGE_DELAY,
+            )
+        except Exception:
+            return {
+                "success": False,
+                "error": "Could not produce valid CriticFeedback after retries."
+            }
+
+        self.info("[PlanCritic] Structured output received")
+        return {"success": True, "feedback": feedback}
 
-        for attempt in range(1, self.MAX_RETRY + 1):
-            self.info(f"[PlanCritic] Attempt {attempt}")
-
-            try:
-                chain = self.chain(plan, query)
-                feedback = await chain.ainvoke({"messages": []})
-
-                self.info("[PlanCritic] Structured output received")
-                return {"success": True, "feedback": feedback}
+    # ------------------------------------------------------------
+    # INVOKE MANY (batch nhiều candidate plan)
+    # ------------------------------------------------------------
+    async def invoke_many(self, plans: List, query=None, max_concurrency: int = 8) -> List[Dict]:
+        """
+        Đánh giá nhiều plan 1 lần: chain.abatch gửi các request song song.
+        Plan nào lỗi sẽ chạy lại qua invoke (có retry); kết quả giữ đúng thứ tự plans.
+        """
+        if not plans:
+            return []
+
+        inputs = [{"query": query, "plan_str": self._format_plan(plan)} for plan in plans]
+        results = await self.chain().abatch(
+            inputs,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
 
-            except Exception as e:
-                self.warning(f"[PlanCritic] Error: {e}")
-                continue
+        async def finalize(plan, result):
+            if isinstance(result, Exception):
+                self.warning(f"[PlanCritic] Batch item failed, retrying: {result}")
+                return await self.invoke(plan, query)
+            return {"success": True, "feedback": result}
 
-        return {
-            "success": False,
-            "error": "Could not produce valid CriticFeedback after retries."
-        }
+        self.info(f"[PlanCritic] Batch evaluated {len(plans)} plans")
+        return list(await asyncio.gather(*(finalize(p, r) for p, r in zip(plans, results))))
@@ -1,9 +1,12 @@
+import asyncio
+import random
+from typing import Dict, List, Union
 from src.agent.base_agent import BaseAgent
-from src.models.models import Plan
-from src.prompt_engineering.templates import PLANNER_PROMPT
+from src.prompt_engineering import templates
 from langchain_core.prompts import ChatPromptTemplate
-from src.handler.error_handler import ErrorSeverity
-from src.agent.plan_critic import PlanCriticAgent
+from src.handler.error_handler import ErrorSeverity, ErrorType
+from src.models.models import Plan
+from src.utils.async_cache import async_memoize
 
 class PlannerAgent(BaseAgent):
     """
@@ -11,63 +14,87 @@ class PlannerAgent(BaseAgent):
     - tạo kế hoạch (Plan)
     """
     MAX_RETRY = 3
+    # Giây chờ attempt hiện tại trước khi bắn thêm attempt song song
+    HEDGE_DELAY = 10.0
+    # Exponential backoff + jitter giữa các attempt sau khi lỗi (giây)
+    BACKOFF_BASE = 0.5
+    RATE_LIMIT_BACKOFF_BASE = 2.0
+    BACKOFF_CAP = 30.0
+    BACKOFF_JITTER = 0.5
 
     def __init__(self, llm, tools=None, name=None, description="", log_dir="logs"):
         super().__init__(llm, tools, name, description, log_dir)
-        self.planner_prompt = PLANNER_PROMPT
+        self.planner_prompt = templates.PLANNER_PROMPT
+        # Build 1 lần: template + structured output dùng lại cho mọi call/retry
+        self._chain = self.build_prompt() | self.structured_llm(Plan)
 
     # ------------------------------------------------------------
     # BUILD PROMPT — thêm biến {error_message} & {attempt}
     # ------------------------------------------------------------
-    def build_prompt(self, error_message: str = "", attempt: int = 1):
+    def build_prompt(self):
         """
         Build template chuẩn SYSTEM + placeholder messages.
-        Cho phép truyền biến attempt và error_message vào hệ thống.
+        Phần tĩnh (system prompt) đứng đầu để provider cache được prefix;
+        {attempt} và {error_message} thay đổi theo retry nên đặt ở cuối.
         """
         return ChatPromptTemplate.from_messages(
             [
-                ("system", self.planner_prompt.format(
-                    error_message=error_message,
-                    attempt=attempt
-                )),
+                ("system", self.planner_prompt),
                 ("human", "{messages}"),
+                ("human", "PreviousError: {error_message}\nAttemptNumber: {attempt}"),
             ]
         )
 
-    def chain(self, error_message: str = "", attempt: int = 1):
+    def chain(self):
         """Prompt → LLM → Structured Plan."""
-        prompt = self.build_prompt(error_message=error_message, attempt=attempt)
-        return prompt | self.llm.with_structured_output(Plan)
+        return self._chain
+
+    @classmethod
+    def _backoff_delay(cls, attempt: int, rate_limited: bool = False) -> float:
+        """min(cap, base * 2^(attempt-1)) + jitter; bị rate limit → base dài hơn."""
+        base = cls.RATE_LIMIT_BACKOFF_BASE if rate_limited else cls.BACKOFF_BASE
+        return min(cls.BACKOFF_CAP, base * 2 ** (attempt - 1)) + random.uniform(0, cls.BACKOFF_JITTER)
 
     # ------------------------------------------------------------
     # INVOKE
     # ------------------------------------------------------------
+    # Cùng query (đã chuẩn hoá khoảng trắng) + cùng feedback → dùng lại Plan.
+    # Replan có error_message khác nên không bị trả lại plan cũ. Chỉ cache plan hợp lệ.
+    @async_memoize(
+        key=lambda self, query, error_message="", attempt=1: (
+            self.llm_signature, " ".join(query.split()), error_message
+        ),
+        cache_if=lambda result: isinstance(result, Plan),
+    )
     async def invoke(self, query: str, error_message: str = "", attempt: int = 1) -> Plan:
         self.debug(f"[PlannerAgent] Generating plan for: {query}")
 
-        chain = self.chain()
-        last_error_message = "None"
+        chain = self._chain
+        # Feedback từ critic (replan) là lỗi đầu vào cho attempt đầu tiên
+        last_error_message = error_message or "None"
+        fatal_error = None
+        attempt_no = 0
+        backoff = 0.0
+
+        async def run_attempt():
+            nonlocal attempt_no, last_error_message, fatal_error, backoff
+            # Lỗi không recoverable → không gọi LLM thêm lần nào nữa
+            if fatal_error is not None:
+                raise fatal_error
+
+            attempt_no += 1
+            current = attempt_no
+            if backoff:
+                await asyncio.sleep(backoff)
+            self.debug(f"[PlannerAgent] Attempt {current}/{self.MAX_RETRY}")
 
-        for attempt in range(1, self.MAX_RETRY + 1):   # bắt đầu từ 1
             try:
-                self.debug(f"[PlannerAgent] Attempt {attempt}/{self.MAX_RETRY}")
-
-                # --------------------------------------------------------
-                # 1) TẠO THÔNG ĐIỆP ĐẦU VÀO CHO PLANNER_PROMPT
-                # --------------------------------------------------------
-                system_vars = {
-                    "attempt": attempt,
-                    "error_message": last_error_message
-                }
-
-                # 2) GENERATE PLAN với biến attempt + error_message
-                result = await chain.ainvoke({
+                # GENERATE PLAN với biến attempt + error_message của attempt lỗi gần nhất
+                return await chain.ainvoke({
                     "messages": [("user", query)],
-                    **system_vars
+                    "attempt": current,
+                    "error_message": last_error_message,
                 })
-                print("Generated Plan: ", result)
-                return result
-
             except Exception as e:
                 agent_error = self.error_handler.handle_exception(
                     e, source="PlannerAgent.invoke"
@@ -76,14 +103,67 @@ class PlannerAgent(BaseAgent):
                 last_error_message = f"{agent_error.error_type}: {agent_error.message}"
 
                 self.warning(
-                    f"[PlannerAgent] Attempt {attempt} failed: {last_error_message}"
+                    f"[PlannerAgent] Attempt {current} failed: {last_error_message}"
                 )
 
                 if agent_error.severity != ErrorSeverity.RECOVERABLE:
-                    break
+                    fatal_error = e
+                else:
+                    backoff = self._backoff_delay(
+                        current, agent_error.error_type == ErrorType.RATE_LIMIT_ERROR
+                    )
+                raise
+
+        try:
+            # Retry dạng hedged: attempt sau chạy khi attempt trước lỗi hoặc chậm
+            # quá HEDGE_DELAY; kết quả đầu tiên hợp lệ thắng, còn lại bị cancel
+            result = await self._hedged(
+                run_attempt,
+                attempts=self.MAX_RETRY,
+                hedge_delay=self.HEDGE_DELAY,
+            )
+            self.debug(f"[PlannerAgent] Generated plan: {result}")
+            return result
+        except Exception:
+            pass
 
         # --------------------------------------------------------
-        # 5) FAIL SAU NHIỀU LẦN THỬ
+        # FAIL SAU NHIỀU LẦN THỬ
         # --------------------------------------------------------
-        self.error(f"[PlannerAgent] Failed after {self.MAX_RETRY} attempts.")
+        self.error(f"[PlannerAgent] Failed after {attempt_no} attempts.")
         return {'success': False, 'message': last_error_message}
+
+    # ------------------------------------------------------------
+    # INVOKE MANY (batch nhiều query)
+    # ------------------------------------------------------------
+    async def invoke_many(self, queries: List[str], max_concurrency: int = 8) -> List[Union[Plan, Dict]]:
+        """
+        Lập plan cho nhiều query 1 lần: chain.abatch gửi các request song song
+        (tối đa max_concurrency). Query trùng nhau chỉ gọi LLM 1 lần.
+        Query nào lỗi sẽ chạy lại qua invoke (có retry + backoff); kết quả giữ đúng thứ tự queries.
+        """
+        if not queries:
+            return []
+
+        unique = list(dict.fromkeys(" ".join(q.split()) for q in queries))
+        inputs = [
+            {"messages": [("user", q)], "attempt": 1, "error_message": "None"}
+            for q in unique
+        ]
+        results = await self._chain.abatch(
+            inputs,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        )
+
+        async def finalize(query, result):
+            if isinstance(result, Exception):
+                self.warning(f"[PlannerAgent] Batch item failed, retrying: {result}")
+                return await self.invoke(query)
+            return result
+
+        plans = await asyncio.gather(*(finalize(q, r) for q, r in zip(unique, results)))
+        by_query = dict(zip(unique, plans))
+
+        self.info(f"[PlannerAgent] Batch planned {len(unique)} unique queries")
+        return [by_query[" ".join(q.split())] for q in queries]
@@ -1,15 +1,24 @@
 from src.agent.base_agent import BaseAgent
 from langchain_core.messages import HumanMessage, SystemMessage
-from src.tools.base_tool import BaseTool
-import json
+from src.utils.helper import try_json_loads
+from src.serializer.serializer import SmartSerializer
 from src.models.models import Response
+from src.utils.async_cache import async_memoize, stable_hash
 
-BaseTool.auto_discover()
 
+_SYSTEM_MESSAGE = SystemMessage(
+    content=(
+        "You are a Math Assistant AI.\n"
+        "Your job is to solve the math problem step-by-step.\n"
+        "If the task requires arithmetic operations, return the tool name and parameters.\n"
+        "If the calculation is simple, you can compute it directly.\n"
+        "Always return valid JSON when specifying a tool."
+        "DO NOT EXPLAIN, just return JSON format like 'success': True/False. 'result': <your answer>."
+    )
+)
 
-class SimpleMathAgent(BaseAgent):
-    tools = BaseTool.list_tools()
 
+class SimpleMathAgent(BaseAgent):
     def __init__(
         self, llm, tools=None, name="SimpleMathAgent",
         description="Agent xử lý các phép toán đơn giản", log_dir="logs"
@@ -28,16 +37,7 @@ class SimpleMathAgent(BaseAgent):
         params = kwargs.get("params", {})
 
         return [
-            SystemMessage(
-                content=(
-                    "You are a Math Assistant AI.\n"
-                    "Your job is to solve the math problem step-by-step.\n"
-                    "If the task requires arithmetic operations, return the tool name and parameters.\n"
-                    "If the calculation is simple, you can compute it directly.\n"
-                    "Always return valid JSON when specifying a tool."
-                    "DO NOT EXPLAIN, just return JSON format like 'success': True/False. 'result': <your answer>."
-                )
-            ),
+            _SYSTEM_MESSAGE,
             HumanMessage(
                 content=f"Task description: {query}\nParameters: {params}"
             ),
@@ -46,6 +46,13 @@ class SimpleMathAgent(BaseAgent):
     # ----------------------------------------------------------
     # LLM REASONING
     # ----------------------------------------------------------
+    # Phép toán deterministic: cùng query + params → cùng kết quả, không gọi lại LLM
+    @async_memoize(
+        key=lambda self, **kwargs: stable_hash(
+            self.llm_signature, kwargs.get("query", ""), kwargs.get("params", {})
+        ),
+        cache_if=lambda resp: resp.get("message") == "success",
+    )
     async def invoke(self, **kwargs):
         """
         Hàm này chạy khi SOP step ở chế độ 'dynamic',
@@ -64,9 +71,11 @@ class SimpleMathAgent(BaseAgent):
 
         self.info(f"[SimpleMathAgent] Raw output: {raw_content}")
 
-        # Nếu LLM trả JSON → parse
-        try:
-            raw_content_json = json.loads(raw_content)
-            return {"message": "success", "result": raw_content_json['result']}
-        except:
-            return {"message": "fail", "result": None}
\ No newline at end of file
+        # Nếu LLM trả JSON → parse; bọc trong ```json / có text xung quanh
+        # → extract object đầu tiên thay vì trả fail (upstream sẽ retry tốn thêm 1 LLM call)
+        raw_content_json = try_json_loads(raw_content)
+        if raw_content_json is None and "{" in raw_content:
+            raw_content_json = SmartSerializer.extract_json(raw_content)
+        if isinstance(raw_content_json, dict) and "result" in raw_content_json:
+            return {"message": "success", "result": raw_content_json["result"]}
+        return {"message": "fail", "result": None}
\ No newline at end of file
@@ -1,17 +1,25 @@
 from src.agent.base_agent import BaseAgent
 from langchain_core.prompts import ChatPromptTemplate
-from src.prompt_engineering.templates import SOP_PROMPT
+from src.prompt_engineering import templates
 from src.utils.helper import validate_sop
 from src.serializer.serializer import SmartSerializer
-from src.models.models import SOP
-import json
+from src.models.models import Plan, SOP
+from src.utils.async_cache import async_memoize
+from typing import Any, Dict, Optional, Tuple
+import asyncio
 
 class SOPAgent(BaseAgent):
+    # Giây chờ attempt hiện tại trước khi bắn thêm attempt song song
+    HEDGE_DELAY = 20.0
+    # Quá số ký tự này kể từ '{' gốc mà chưa thấy key "steps" → output hỏng, huỷ stream sớm
+    STEPS_KEY_WINDOW = 1024
 
     def __init__(self, llm, tools=None, name=None, log_dir="logs"):
         super().__init__(llm, tools, name, log_dir)
-        self.prompt = SOP_PROMPT
+        self.prompt = templates.SOP_PROMPT
         self.MAX_RETRY = 5
+        # Prompt SOP là hằng số → build chain 1 lần, dùng lại cho mọi attempt
+        self._chain = self.build_prompt() | self.llm
 
     def build_prompt(self):
         return ChatPromptTemplate.from_messages([
@@ -20,60 +28,166 @@ class SOPAgent(BaseAgent):
         ])
 
     def chain(self):
-        return self.build_prompt() | self.llm
+        return self._chain
 
-    async def _attempt_generate(self, plan_str: str, agents_str: str, attempt: int, raw: str | None, error_msg: str | None):
+    @staticmethod
+    def _static_block(plan_str: str, agents_str: str) -> str:
         """
-        USER message only contains RAW DATA — NO INSTRUCTIONS.
+        Phần user message không đổi giữa các attempt của cùng 1 plan → build 1 lần.
+        Thứ tự: phần tĩnh trong session (AVAILABLE_AGENTS) trước, phần đổi theo
+        plan sau → SOP_PROMPT + agents là prefix chung, provider cache được.
         """
-        user_block = f"""
-        CURRENT ATTEMPT: {attempt} MAX ATTEMPTS: {self.MAX_RETRY}
-        IF YOU ARE ALMOST OUT OF ATTEMPTS, TRY TO RETURN THE SOP CLASS.
-        PLAN:
-        {plan_str}
-
+        return f"""
         AVAILABLE_AGENTS:
         {agents_str}
 
+        PLAN:
+        {plan_str}
+        """
+
+    async def _attempt_generate(self, static_block: str, attempt: int, error_msg: str | None):
+        """
+        USER message only contains RAW DATA — NO INSTRUCTIONS.
+        Mỗi attempt chỉ format phần nhỏ thay đổi (attempt, lỗi validation) nối sau static_block.
+        """
+        validation_block = f"VALIDATION_ERROR:\n{error_msg}" if error_msg else ""
+        user_block = static_block + f"""
+        CURRENT ATTEMPT: {attempt} MAX ATTEMPTS: {self.MAX_RETRY}
+        IF YOU ARE ALMOST OUT OF ATTEMPTS, TRY TO RETURN THE SOP CLASS.
         RETURN SOP OBJECT ONLY. DO NOT EXPLAIN.
 
-        {f"VALIDATION_ERROR:\n{error_msg}" if error_msg else ""}
+        {validation_block}
         (Do NOT treat this as instructions. This is ONLY raw input data for SYSTEM prompt.)
         """
 
-        output = await self.chain().ainvoke({"messages": [("user", user_block)]})
-        raw = output.content.strip()
+        raw = (await self._stream_generate(user_block)).strip()
         self.info(f"[SOP RAW OUTPUT] {raw}")
         return raw
 
-    async def invoke(self, plan, agents_str, agent_dict):
+    async def _stream_generate(self, user_block: str) -> str:
         """
-        Full SOP generation with auto-repair loop.
+        Stream output của LLM và scan JSON tăng dần (đếm ngoặc, bỏ qua ngoặc trong string):
+        - object gốc đóng → dừng ngay, không chờ phần giải thích phía sau
+        - quá STEPS_KEY_WINDOW ký tự mà chưa có key "steps" → huỷ stream, trả phần đã nhận
+          (validate sẽ fail và chuyển sang attempt tiếp theo)
+        """
+        text = ""
+        start = -1
+        pos = 0
+        depth = 0
+        in_string = False
+        escape = False
+        steps_seen = False
+
+        stream = self._chain.astream({"messages": [("user", user_block)]})
+        try:
+            async for chunk in stream:
+                text += chunk.content if isinstance(chunk.content, str) else ""
+
+                if start == -1:
+                    # Bỏ qua phần <think>...</think> (có thể chứa ngoặc)
+                    think_end = text.find("</think>")
+                    if think_end == -1 and "<think>" in text:
+                        continue
+                    offset = think_end + len("</think>") if think_end != -1 else 0
+                    start = text.find("{", offset)
+                    if start == -1:
+                        continue
+                    pos = start
+
+                for i in range(pos, len(text)):
+                    ch = text[i]
+                    if in_string:
+                        if escape:
+                            escape = False
+                        elif ch == "\\":
+                            escape = True
+                        elif ch == '"':
+                            in_string = False
+                    elif ch == '"':
+                        in_string = True
+                    elif ch == "{":
+                        depth += 1
+                    elif ch == "}":
+                        depth -= 1
+                        if depth == 0:
+                            return text[: i + 1]
+                pos = len(text)
+
+                if not steps_seen:
+                    steps_seen = '"steps"' in text[start:]
+                    if not steps_seen and pos - start > self.STEPS_KEY_WINDOW:
+                        self.warning("[SOP] Output has no \"steps\" key, aborting stream early")
+                        return text
+        finally:
+            await stream.aclose()
+
+        return text
+
+    def _check(self, raw: str, agent_dict) -> Tuple[Optional[SOP], Optional[str]]:
+        """Extract + validate output của 1 attempt → (sop, None) hoặc (None, error)."""
+        # ---- STEP 1: extract JSON dict ----
+        # Không có '{' (từ chối / văn xuôi) → không thể chứa SOP, bỏ qua regex + parse
+        if "{" not in raw:
+            return None, "No JSON object found in output."
+        sop_dict = SmartSerializer.extract_json(raw)
+        if not sop_dict:
+            return None, "Output is not valid JSON or no JSON block found."
+
+        # ---- STEP 2: validate ----
+        ok, err = validate_sop(sop_dict, agent_dict)
+        if not ok:
+            return None, err
+
+        return SmartSerializer.parse_model(model=SOP, data=sop_dict), None
+
+    # Cùng model + prompt + plan + catalog agent/tool → dùng lại SOP (SOP frozen nên
+    # chia sẻ an toàn). Chỉ cache khi output deterministic (temperature 0).
+    # agent_dict được suy ra từ cùng nguồn với agents_str nên không cần đưa vào key
+    @async_memoize(
+        key=lambda self, plan, agents_str, agent_dict: (
+            None if self.llm_signature[2]
+            else (self.llm_signature, self.prompt, tuple(plan.steps), agents_str)
+        ),
+        cache_if=lambda resp: resp.get("success"),
+    )
+    async def invoke(self, plan: Plan, agents_str: str, agent_dict: Dict[str, Dict[str, Any]]):
+        """
+        Full SOP generation (hedged retries + auto-repair):
+        - Attempt tiếp theo chỉ được bắn khi attempt trước trả về SOP không hợp lệ
+          (kèm lỗi validation gần nhất) hoặc chạy quá HEDGE_DELAY giây
+        - SOP hợp lệ đầu tiên thắng, các attempt còn đang chạy bị cancel
         """
         plan_str = "\n".join(f"{i+1}. {s}" for i, s in enumerate(plan.steps))
+        static_block = self._static_block(plan_str, agents_str)
+
         last_error = None
-        sop_dict_str = None
-        
-        for attempt in range(1, self.MAX_RETRY + 1):
-            self.info(f"[SOP] Attempt {attempt}")
-
-            raw = await self._attempt_generate(plan_str, agents_str, attempt, sop_dict_str, last_error)
-
-            # ---- STEP 1: extract JSON dict ----
-            sop_dict = SmartSerializer.extract_json(raw)
-            if sop_dict is {} or sop_dict is None:
-                last_error = "Output is not valid JSON or no JSON block found."
-                continue
-
-            # ---- STEP 2: validate ----
-            ok, err = validate_sop(sop_dict, agent_dict)
-            if ok:
-                self.info("[SOP VALID] SOP passed validation")
-                sop = SmartSerializer.parse_model(model=SOP, data=sop_dict)
-                return {"success": True, "sop": sop}
-
-            last_error = err
-            self.warning(f"[SOP INVALID] {err}")
+        attempt_no = 0
+
+        async def run_attempt():
+            nonlocal attempt_no, last_error
+            attempt_no += 1
+            current = attempt_no
+
+            raw = await self._attempt_generate(static_block, current, last_error)
+
+            sop, err = self._check(raw, agent_dict)
+            if sop is None:
+                last_error = err
+                self.warning(f"[SOP INVALID] {err}")
+                raise ValueError(err)
+            return sop
+
+        try:
+            sop = await self._hedged(
+                run_attempt,
+                attempts=self.MAX_RETRY,
+                hedge_delay=self.HEDGE_DELAY,
+            )
+            self.info("[SOP VALID] SOP passed validation")
+            return {"success": True, "sop": sop}
+        except Exception as e:
+            last_error = last_error or str(e)
 
         # FINAL FAIL
         self.error(f"[SOP FAIL] Could not generate valid SOP: {last_error}")
@@ -1,6 +1,33 @@
-from src.utils.helper import load_yaml
+from functools import lru_cache
+from src.utils.helper import load_config
 from src.constants.config_path import MODEL_CONFIG_PATH, PROMPT_TEMPLATES_PATH, SAFETY_POLICY_PATH
 
-MODEL_CONFIG = load_yaml(MODEL_CONFIG_PATH)
-PROMPT_TEMPLATES = load_yaml(PROMPT_TEMPLATES_PATH)
-SAFETY_POLICY = load_yaml(SAFETY_POLICY_PATH)
\ No newline at end of file
+
+# YAML chỉ được đọc khi dùng lần đầu (không tốn IO/parse lúc import), sau đó cache
+@lru_cache(maxsize=None)
+def get_model_config():
+    return load_config(MODEL_CONFIG_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_prompt_templates():
+    return load_config(PROMPT_TEMPLATES_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_safety_policy():
+    return load_config(SAFETY_POLICY_PATH)
+
+
+_LAZY_CONSTANTS = {
+    "MODEL_CONFIG": get_model_config,
+    "PROMPT_TEMPLATES": get_prompt_templates,
+    "SAFETY_POLICY": get_safety_policy,
+}
+
+
+def __getattr__(name):
+    # PEP 562: giữ API cũ (MODEL_CONFIG, PROMPT_TEMPLATES, SAFETY_POLICY) nhưng load lazy
+    if name in _LAZY_CONSTANTS:
+        return _LAZY_CONSTANTS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,14 @@
 from src.utils.logger import LoggerMixin
 from src.agent.base_agent import BaseAgent
 from src.agent.sop_agent import SOPAgent
-from typing import List
+from typing import List, Tuple
 from src.tools.base_tool import BaseTool
 
-def build_available_agents_dict(agents) -> dict:
+def describe_agents(agents) -> Tuple[str, dict]:
     """
-    Build structure for validate_sop:
+    1 vòng duyệt agents, trả về cả 2 dạng mô tả:
+    - agent_str: text tools theo group cho prompt SOPAgent
+    - agent_dict: structure cho validate_sop
     {
         "CRUDAgent": {
             "tools": {
@@ -16,20 +18,21 @@ def build_available_agents_dict(agents) -> dict:
         }
     }
     """
-    result = {}
+    parts = []
+    agent_dict = {}
 
     for agent in agents:
         agent_name = agent.__class__.__name__
-        tools = {}
 
-        for tool in agent.get_tools():
-            tools[tool.__name__] = tool.__doc__ or ""
-
-        result[agent_name] = {
-            "tools": tools
+        parts.append(
+            BaseTool.get_tools_grouped_str_by_callables(tools=agent.get_tools(), agent_name=agent_name)
+        )
+        # Dict name → doc đã được agent cache sẵn, không duyệt lại list tools
+        agent_dict[agent_name] = {
+            "tools": agent.get_tool_descriptions()
         }
 
-    return result
+    return "\n\n".join(parts), agent_dict
 
 class SOPStepDispatcher(LoggerMixin):
     """
@@ -40,17 +43,26 @@ class SOPStepDispatcher(LoggerMixin):
         super().__init__(name=name or "SOPStepDispatcher", log_dir=log_dir)
         self.sop_agent = sop_agent    
         self.agents = agents          
+        # (key, (agent_str, agent_dict)) — mô tả agents dùng lại giữa các query
+        self._described = None
 
         self.info(f"[INIT] Dispatcher loaded with agents: {', '.join(agent.__class__.__name__ for agent in self.agents)}")
 
+    def describe_agents(self) -> Tuple[str, dict]:
+        """
+        agent_str/agent_dict được cache theo tools_version của từng agent:
+        agent register tool mới → version mới (duy nhất toàn cục) → build lại.
+        """
+        key = tuple(agent.tools_version for agent in self.agents)
+        if self._described is None or self._described[0] != key:
+            self._described = (key, describe_agents(self.agents))
+        return self._described[1]
+
     async def build_sop(self, plan):
         """
         Nhận plan từ PlannerAgent để biết agent nào cung cấp tool descriptions.
         """
-        agent_str = ""
-        agent_str = "\n\n".join(BaseTool.get_tools_grouped_str_by_callables(tools=agent.get_tools(), agent_name=agent.__class__.__name__)for agent in self.agents)
-
-        agent_dict = build_available_agents_dict(agents=self.agents)
+        agent_str, agent_dict = self.describe_agents()
         sop = await self.sop_agent.invoke(plan, agent_str, agent_dict)
 
         if sop["success"] is not True:
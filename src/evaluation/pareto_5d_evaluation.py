@@ -1,8 +1,10 @@
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field
 from enum import Enum
 import asyncio
-import json
+import operator
+import re
 import time
 from datetime import datetime
 from src.utils.logger import LoggerMixin
@@ -18,19 +20,78 @@ class EvaluationDimension(Enum):
     ALIGNMENT = "alignment"
 
 
+# Nhãn hiển thị của từng dimension (tránh truy cập enum .value lặp lại)
+_DIM_LABELS = {dimension: dimension.value for dimension in EvaluationDimension}
+
+
 @dataclass
 class DimensionScore:
     dimension: EvaluationDimension
     score: float  # 0-10 scale
     weight: float = 1.0
-    metrics: Dict[str, Any] = None
-    issues: List[str] = None
-    
-    def __post_init__(self):
-        if self.metrics is None:
-            self.metrics = {}
-        if self.issues is None:
-            self.issues = []
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    issues: List[str] = field(default_factory=list)
+
+
+# Từ khoá trong description (so khớp trên description đã lower())
+MEANINGLESS_INDICATORS = ('test', 'debug', 'nothing', 'empty', 'skip')
+ERROR_KEYWORDS = ('error', 'fail', 'check', 'validate', 'verify')
+DESTRUCTIVE_TOOLS = frozenset(('delete_file', 'remove', 'drop', 'truncate'))
+
+# Gộp keyword thành 1 regex alternation → 1 lần search thay vì k lần `in`
+_MEANINGLESS_RE = re.compile("|".join(map(re.escape, MEANINGLESS_INDICATORS)))
+_ERROR_KEYWORDS_RE = re.compile("|".join(map(re.escape, ERROR_KEYWORDS)))
+
+# Field bắt buộc của step (COMPLETENESS), theo thứ tự báo lỗi
+REQUIRED_STEP_FIELDS = ('step_number', 'description', 'action_type')
+
+# Tham số bắt buộc theo tool (ROBUSTNESS / COMPLETENESS)
+_REQUIRED_PARAMS = {
+    "create_file": ("filename", "content"),
+    "edit_file": ("filename",),
+}
+
+# Field luôn được khai báo trên SOPStep → đọc 1 lần bằng attrgetter (C-level).
+# preconditions/condition không có trong model hiện tại nên vẫn dùng getattr + default.
+_step_fields = operator.attrgetter(*REQUIRED_STEP_FIELDS, 'params')
+
+
+@dataclass
+class StepScan:
+    """
+    Kết quả duyệt sop.steps đúng 1 lần (_scan_steps).
+    Các dimension đọc số liệu từ đây thay vì mỗi helper tự duyệt lại steps.
+    """
+    step_count: int = 0
+    # CORRECTNESS: lỗi serialize JSON (None = hợp lệ), dùng chung cho ALIGNMENT
+    json_error: Optional[str] = None
+    # check cấp SOP giữ theo tên; check per-step chỉ ghi lại tên các check fail
+    schema_checks: Dict[str, bool] = field(default_factory=dict)
+    required_checks: Dict[str, bool] = field(default_factory=dict)
+    schema_failures: List[str] = field(default_factory=list)
+    type_failures: List[str] = field(default_factory=list)
+    required_failures: List[str] = field(default_factory=list)
+    # COMPLETENESS: (index, missing_fields)
+    incomplete_steps: List[Tuple[int, List[str]]] = field(default_factory=list)
+    parameter_issues: List[str] = field(default_factory=list)
+    # EFFICIENCY
+    meaningless_steps: int = 0
+    action_counts: Counter = field(default_factory=Counter)
+    param_total: int = 0
+    excessive_parameters: int = 0
+    complexity: float = 0.0
+    # ROBUSTNESS: action_type[1] của các step có action_type đủ 2 phần tử (theo thứ tự)
+    tool_names: List[Any] = field(default_factory=list)
+    tool_usage: Counter = field(default_factory=Counter)
+    compatibility_issues: List[str] = field(default_factory=list)
+    has_preconditions: bool = False
+    has_conditions: bool = False
+    error_handling_steps: int = 0
+    # ALIGNMENT
+    sequential_numbering: bool = True
+    action_format_issues: List[str] = field(default_factory=list)
+    unguarded_destructive: bool = False
+    description_issues: List[str] = field(default_factory=list)
 
 
 @dataclass
@@ -53,6 +114,8 @@ class SOPEvaluator(LoggerMixin):
     def __init__(self, available_tools: List[str], name="SOPEvaluator"):
         super().__init__(name)
         self.available_tools = available_tools
+        # Set để membership test O(1) khi validate tool
+        self._available_tools = frozenset(available_tools)
         self.dimension_weights = {
             EvaluationDimension.CORRECTNESS: 0.25,
             EvaluationDimension.COMPLETENESS: 0.25,
@@ -60,41 +123,46 @@ class SOPEvaluator(LoggerMixin):
             EvaluationDimension.ROBUSTNESS: 0.20,
             EvaluationDimension.ALIGNMENT: 0.15
         }
+        # Trọng số theo đúng thứ tự dimension_results trong evaluate_sop
+        self._weights_tuple = tuple(self.dimension_weights.values())
     
     async def evaluate_sop(self, sop: SOP, original_plan: Any, prompt_used: str = "") -> SOPEvaluationResult:
         """Đánh giá SOP theo 5 chiều"""
         self.info("Starting SOP 5D Evaluation...")
         
-        start_time = time.time()
+        timestamp = datetime.now()
+        start_time = time.perf_counter()
         
-        # Đánh giá từng dimension
-        evaluation_tasks = [
-            self._evaluate_correctness(sop),
-            self._evaluate_completeness(sop, original_plan),
-            self._evaluate_efficiency(sop),
-            self._evaluate_robustness(sop),
-            self._evaluate_alignment(sop, prompt_used)
+        # Duyệt steps 1 lần, các dimension dùng chung kết quả
+        scan = self._scan_steps(sop)
+
+        # Đánh giá từng dimension — thuần CPU, không có I/O → gọi tuần tự,
+        # không tốn task/event-loop dispatch như asyncio.gather
+        dimension_results = [
+            self._evaluate_correctness(sop, scan),
+            self._evaluate_completeness(sop, original_plan, scan),
+            self._evaluate_efficiency(scan),
+            self._evaluate_robustness(scan),
+            self._evaluate_alignment(sop, prompt_used, scan)
         ]
         
-        dimension_results = await asyncio.gather(*evaluation_tasks)
-        
         # Tổng hợp kết quả
         dimension_scores = {
             result.dimension: result for result in dimension_results
         }
         
-        overall_score = self._calculate_overall_score(dimension_scores)
+        overall_score = self._calculate_overall_score(dimension_results)
         passed_checks, failed_checks = self._compile_checks(dimension_scores)
         recommendations = self._generate_recommendations(dimension_scores)
         
-        eval_time = time.time() - start_time
+        eval_time = time.perf_counter() - start_time
         
         self.info(f"Evaluation completed in {eval_time:.2f}s - Score: {overall_score}/10")
         
         return SOPEvaluationResult(
             sop=sop,
             original_plan=original_plan,
-            timestamp=datetime.now(),
+            timestamp=timestamp,
             overall_score=overall_score,
             dimension_scores=dimension_scores,
             passed_checks=passed_checks,
@@ -102,48 +170,40 @@ class SOPEvaluator(LoggerMixin):
             recommendations=recommendations
         )
     
-    async def _evaluate_correctness(self, sop: SOP) -> DimensionScore:
+    def _evaluate_correctness(self, sop: SOP, scan: StepScan) -> DimensionScore:
         """1. CORRECTNESS: Đánh giá tính đúng đắn format và schema"""
         metrics = {}
         issues = []
         score = 10.0  # Start with perfect score, deduct for issues
         
         # 1.1 JSON Structure Validation
-        try:
-            # Test serialization to JSON
-            sop_json = json.dumps(sop.dict(), indent=2)
-            metrics["valid_json"] = True
-        except Exception as e:
-            metrics["valid_json"] = False
-            issues.append(f"Invalid JSON structure: {e}")
-            score -= 3.0
+        # SOP không serialize được → cấu trúc hỏng, các check schema/type phía sau
+        # không còn ý nghĩa → trả về ngay
+        if scan.json_error is not None:
+            return DimensionScore(
+                dimension=EvaluationDimension.CORRECTNESS,
+                score=0.0,
+                metrics={"valid_json": False},
+                issues=[f"Invalid JSON structure: {scan.json_error}"]
+            )
+        metrics["valid_json"] = True
         
         # 1.2 Schema Validation
-        schema_checks = self._validate_schema(sop)
-        metrics.update(schema_checks)
-        
-        for check_name, check_passed in schema_checks.items():
-            if not check_passed:
-                score -= 0.5
-                issues.append(f"Schema violation: {check_name}")
+        metrics.update(scan.schema_checks)
+        metrics["schema_failures"] = len(scan.schema_failures)
+        score -= 0.5 * len(scan.schema_failures)
+        issues.extend(f"Schema violation: {check_name}" for check_name in scan.schema_failures)
         
         # 1.3 Field Type Validation
-        type_checks = self._validate_field_types(sop)
-        metrics.update(type_checks)
-        
-        for check_name, check_passed in type_checks.items():
-            if not check_passed:
-                score -= 1.0
-                issues.append(f"Type violation: {check_name}")
+        metrics["type_failures"] = len(scan.type_failures)
+        score -= 1.0 * len(scan.type_failures)
+        issues.extend(f"Type violation: {check_name}" for check_name in scan.type_failures)
         
         # 1.4 Required Fields Check
-        required_checks = self._validate_required_fields(sop)
-        metrics.update(required_checks)
-        
-        for check_name, check_passed in required_checks.items():
-            if not check_passed:
-                score -= 2.0
-                issues.append(f"Missing required field: {check_name}")
+        metrics.update(scan.required_checks)
+        metrics["missing_required"] = len(scan.required_failures)
+        score -= 2.0 * len(scan.required_failures)
+        issues.extend(f"Missing required field: {check_name}" for check_name in scan.required_failures)
         
         return DimensionScore(
             dimension=EvaluationDimension.CORRECTNESS,
@@ -152,7 +212,7 @@ class SOPEvaluator(LoggerMixin):
             issues=issues
         )
     
-    async def _evaluate_completeness(self, sop: SOP, original_plan: Any) -> DimensionScore:
+    def _evaluate_completeness(self, sop: SOP, original_plan: Any, scan: StepScan) -> DimensionScore:
         """2. COMPLETENESS: Đánh giá tính đầy đủ - tất cả step được map"""
         metrics = {}
         issues = []
@@ -160,7 +220,7 @@ class SOPEvaluator(LoggerMixin):
         
         # 2.1 Step Coverage
         plan_step_count = self._count_plan_steps(original_plan)
-        sop_step_count = len(sop.steps) if sop.steps else 0
+        sop_step_count = scan.step_count
         
         metrics["plan_steps"] = plan_step_count
         metrics["sop_steps"] = sop_step_count
@@ -172,19 +232,16 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Missing {missing_steps} steps from original plan")
         
         # 2.2 Field Completeness in Steps
-        incomplete_steps = 0
-        for i, step in enumerate(sop.steps or []):
-            step_completeness = self._check_step_completeness(step)
-            if not step_completeness["all_required"]:
-                incomplete_steps += 1
-                issues.append(f"Step {i+1} missing required fields: {step_completeness['missing_fields']}")
+        incomplete_steps = len(scan.incomplete_steps)
+        for i, missing_fields in scan.incomplete_steps:
+            issues.append(f"Step {i+1} missing required fields: {missing_fields}")
         
         if incomplete_steps > 0:
             score -= incomplete_steps * 1.5
             metrics["incomplete_steps"] = incomplete_steps
         
         # 2.3 Parameter Completeness
-        parameter_issues = self._check_parameter_completeness(sop)
+        parameter_issues = scan.parameter_issues
         if parameter_issues:
             score -= len(parameter_issues) * 1.0
             issues.extend(parameter_issues)
@@ -197,14 +254,14 @@ class SOPEvaluator(LoggerMixin):
             issues=issues
         )
     
-    async def _evaluate_efficiency(self, sop: SOP) -> DimensionScore:
+    def _evaluate_efficiency(self, scan: StepScan) -> DimensionScore:
         """3. EFFICIENCY: Đánh giá hiệu quả - không dư thừa, không step vô nghĩa"""
         metrics = {}
         issues = []
         score = 10.0
         
         # 3.1 Step Efficiency Analysis
-        efficiency_analysis = self._analyze_step_efficiency(sop)
+        efficiency_analysis = self._analyze_step_efficiency(scan)
         metrics.update(efficiency_analysis)
         
         # Deduct for redundant steps
@@ -220,7 +277,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Found {meaningless_count} meaningless steps")
         
         # 3.2 Parameter Efficiency
-        parameter_efficiency = self._analyze_parameter_efficiency(sop)
+        parameter_efficiency = self._analyze_parameter_efficiency(scan)
         metrics.update(parameter_efficiency)
         
         # Deduct for excessive parameters
@@ -230,7 +287,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Found {excessive_params} steps with excessive parameters")
         
         # 3.3 SOP Complexity
-        complexity_score = self._calculate_complexity(sop)
+        complexity_score = self._calculate_complexity(scan)
         metrics["complexity_score"] = complexity_score
         
         if complexity_score > 7:  # High complexity
@@ -244,14 +301,14 @@ class SOPEvaluator(LoggerMixin):
             issues=issues
         )
     
-    async def _evaluate_robustness(self, sop: SOP) -> DimensionScore:
+    def _evaluate_robustness(self, scan: StepScan) -> DimensionScore:
         """4. ROBUSTNESS: Đánh giá độ bền - không bịa tool, chịu được thay đổi"""
         metrics = {}
         issues = []
         score = 10.0
         
         # 4.1 Tool Existence Validation
-        tool_validation = self._validate_tools_exist(sop)
+        tool_validation = self._validate_tools_exist(scan)
         metrics.update(tool_validation)
         
         fake_tools = tool_validation.get("fake_tools", [])
@@ -260,7 +317,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Using non-existent tools: {', '.join(fake_tools)}")
         
         # 4.2 Tool Parameter Compatibility
-        param_compatibility = self._check_tool_parameter_compatibility(sop)
+        param_compatibility = self._check_tool_parameter_compatibility(scan)
         metrics.update(param_compatibility)
         
         incompatible_steps = param_compatibility.get("incompatible_steps", 0)
@@ -269,7 +326,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Found {incompatible_steps} steps with incompatible parameters")
         
         # 4.3 Resilience to Tool Changes
-        resilience_score = self._evaluate_resilience(sop)
+        resilience_score = self._evaluate_resilience(scan)
         metrics["resilience_score"] = resilience_score
         
         if resilience_score < 6.0:
@@ -277,7 +334,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append("SOP is not resilient to tool changes")
         
         # 4.4 Error Handling in Steps
-        error_handling = self._check_error_handling(sop)
+        error_handling = self._check_error_handling(scan)
         metrics.update(error_handling)
         
         if not error_handling.get("has_preconditions", False):
@@ -291,14 +348,14 @@ class SOPEvaluator(LoggerMixin):
             issues=issues
         )
     
-    async def _evaluate_alignment(self, sop: SOP, prompt_used: str) -> DimensionScore:
+    def _evaluate_alignment(self, sop: SOP, prompt_used: str, scan: StepScan) -> DimensionScore:
         """5. ALIGNMENT: Đánh giá sự tuân thủ - đúng prompt, đúng format, không vi phạm rule"""
         metrics = {}
         issues = []
         score = 10.0
         
         # 5.1 Prompt Compliance
-        prompt_compliance = self._check_prompt_compliance(sop, prompt_used)
+        prompt_compliance = self._check_prompt_compliance(sop, prompt_used, scan)
         metrics.update(prompt_compliance)
         
         if not prompt_compliance.get("follows_instructions", True):
@@ -306,7 +363,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append("Does not follow prompt instructions")
         
         # 5.2 Output Format Compliance
-        format_compliance = self._check_format_compliance(sop)
+        format_compliance = self._check_format_compliance(scan)
         metrics.update(format_compliance)
         
         format_violations = format_compliance.get("format_violations", 0)
@@ -315,7 +372,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Found {format_violations} format violations")
         
         # 5.3 Non-Tool Rule Compliance
-        rule_compliance = self._check_rule_compliance(sop)
+        rule_compliance = self._check_rule_compliance(scan)
         metrics.update(rule_compliance)
         
         rule_violations = rule_compliance.get("rule_violations", 0)
@@ -324,7 +381,7 @@ class SOPEvaluator(LoggerMixin):
             issues.append(f"Found {rule_violations} rule violations")
         
         # 5.4 Instruction Following
-        instruction_following = self._check_instruction_following(sop)
+        instruction_following = self._check_instruction_following(scan)
         metrics.update(instruction_following)
         
         if not instruction_following.get("follows_basic_rules", True):
@@ -339,60 +396,136 @@ class SOPEvaluator(LoggerMixin):
         )
     
     # ===== IMPLEMENTATION METHODS =====
-    
-    def _validate_schema(self, sop: SOP) -> Dict[str, bool]:
-        """Validate SOP schema compliance"""
-        checks = {}
-        
-        # Check main structure
-        checks["has_steps"] = bool(sop.steps and len(sop.steps) > 0)
-        checks["steps_is_list"] = isinstance(sop.steps, list)
-        
-        # Check step structure
-        if sop.steps:
-            for i, step in enumerate(sop.steps):
-                checks[f"step_{i}_has_number"] = hasattr(step, 'step_number') and step.step_number is not None
-                checks[f"step_{i}_has_description"] = bool(getattr(step, 'description', None))
-                checks[f"step_{i}_has_action_type"] = bool(getattr(step, 'action_type', None))
-        
-        return checks
-    
-    def _validate_field_types(self, sop: SOP) -> Dict[str, bool]:
-        """Validate field types"""
-        checks = {}
-        
-        if sop.steps:
-            for i, step in enumerate(sop.steps):
-                # Check action_type is List[str]
-                action_type = getattr(step, 'action_type', None)
-                checks[f"step_{i}_action_type_list"] = isinstance(action_type, list)
-                if action_type:
-                    checks[f"step_{i}_action_type_strings"] = all(isinstance(item, str) for item in action_type)
-                
-                # Check params is Dict
-                params = getattr(step, 'params', {})
-                checks[f"step_{i}_params_dict"] = isinstance(params, dict)
-                
-                # Check step_number is int
-                step_number = getattr(step, 'step_number', None)
-                checks[f"step_{i}_step_number_int"] = isinstance(step_number, int)
-        
-        return checks
-    
-    def _validate_required_fields(self, sop: SOP) -> Dict[str, bool]:
-        """Validate required fields are present"""
-        checks = {}
-        
-        checks["has_steps_field"] = hasattr(sop, 'steps')
-        
-        if sop.steps:
-            for i, step in enumerate(sop.steps):
-                checks[f"step_{i}_has_step_number"] = hasattr(step, 'step_number') and step.step_number is not None
-                checks[f"step_{i}_has_description"] = bool(getattr(step, 'description', None))
-                checks[f"step_{i}_has_action_type"] = bool(getattr(step, 'action_type', None))
-        
-        return checks
-    
+
+    def _scan_steps(self, sop: SOP) -> StepScan:
+        """
+        Duyệt sop.steps đúng 1 lần, đọc field mỗi step vào biến local và tích luỹ
+        mọi check/counter per-step của 5 dimension vào StepScan.
+        """
+        steps = sop.steps or []
+        scan = StepScan(step_count=len(steps))
+
+        # Serialize 1 lần bằng encoder của pydantic (không qua dict trung gian,
+        # không pretty-print); chỉ cần biết có serialize được hay không
+        try:
+            sop.model_dump_json()
+        except Exception as e:
+            scan.json_error = str(e)
+
+        scan.schema_checks["has_steps"] = bool(sop.steps and len(sop.steps) > 0)
+        scan.schema_checks["steps_is_list"] = isinstance(sop.steps, list)
+        scan.required_checks["has_steps_field"] = hasattr(sop, 'steps')
+        scan.schema_failures.extend(name for name, ok in scan.schema_checks.items() if not ok)
+        scan.required_failures.extend(name for name, ok in scan.required_checks.items() if not ok)
+
+        # Base complexity from step count
+        if steps:
+            scan.complexity = min(len(steps) * 0.5, 5.0)
+
+        for i, step in enumerate(steps):
+            step_number, description, action_type, params = _step_fields(step)
+            preconditions = getattr(step, 'preconditions', None)
+            condition = getattr(step, 'condition', None)
+            desc = (description or '').lower()
+
+            # --- CORRECTNESS: schema / field types / required fields ---
+            has_number = step_number is not None
+            has_description = bool(description)
+            has_action_type = bool(action_type)
+
+            if not has_number:
+                scan.schema_failures.append(f"step_{i}_has_number")
+                scan.required_failures.append(f"step_{i}_has_step_number")
+            if not has_description:
+                scan.schema_failures.append(f"step_{i}_has_description")
+                scan.required_failures.append(f"step_{i}_has_description")
+            if not has_action_type:
+                scan.schema_failures.append(f"step_{i}_has_action_type")
+                scan.required_failures.append(f"step_{i}_has_action_type")
+
+            # action_type là List[str], params là Dict, step_number là int
+            if not isinstance(action_type, list):
+                scan.type_failures.append(f"step_{i}_action_type_list")
+            if action_type and not all(isinstance(item, str) for item in action_type):
+                scan.type_failures.append(f"step_{i}_action_type_strings")
+            if not isinstance(params, dict):
+                scan.type_failures.append(f"step_{i}_params_dict")
+            if not isinstance(step_number, int):
+                scan.type_failures.append(f"step_{i}_step_number_int")
+
+            # --- COMPLETENESS: required components ---
+            missing_fields = [
+                name for name, value in zip(REQUIRED_STEP_FIELDS, (step_number, description, action_type))
+                if value is None
+            ]
+            if missing_fields:
+                scan.incomplete_steps.append((i, missing_fields))
+
+            # --- Tool-level checks (completeness / robustness) ---
+            if action_type and len(action_type) >= 2:
+                tool_name = action_type[1]
+                scan.tool_names.append(tool_name)
+                scan.tool_usage[tool_name] += 1
+
+                # Basic parameter checks based on tool type
+                required = _REQUIRED_PARAMS.get(tool_name)
+                if required:
+                    missing = [name for name in required if not params.get(name)]
+                    if missing:
+                        if 'filename' in missing:
+                            scan.parameter_issues.append(f"Step {i+1}: {tool_name} missing 'filename' parameter")
+                        if len(required) > 1:
+                            scan.compatibility_issues.append(f"Step {i+1}: {tool_name} missing required parameters")
+                        else:
+                            scan.compatibility_issues.append(f"Step {i+1}: {tool_name} missing '{required[0]}' parameter")
+
+            # --- EFFICIENCY ---
+            if action_type:
+                scan.action_counts[tuple(action_type)] += 1
+            if _MEANINGLESS_RE.search(desc):
+                scan.meaningless_steps += 1
+            param_count = len(params)
+            scan.param_total += param_count
+            if param_count > 5:  # Consider more than 5 parameters as excessive
+                scan.excessive_parameters += 1
+
+            # Additional complexity from conditions and preconditions
+            if preconditions:
+                scan.complexity += len(preconditions) * 0.3
+                scan.has_preconditions = True
+            if condition:
+                scan.complexity += 1.0
+                scan.has_conditions = True
+
+            # --- ROBUSTNESS: error handling in description ---
+            if _ERROR_KEYWORDS_RE.search(desc):
+                scan.error_handling_steps += 1
+
+            # --- ALIGNMENT ---
+            if scan.sequential_numbering and step_number != i + 1:
+                scan.sequential_numbering = False
+            if action_type and (not isinstance(action_type, list) or len(action_type) < 2):
+                scan.action_format_issues.append(f"Step {i+1}: Invalid action_type format")
+
+            # Destructive operations phải có safeguard
+            if (
+                action_type
+                and not scan.unguarded_destructive
+                and not preconditions
+                and not condition
+                and not DESTRUCTIVE_TOOLS.isdisjoint(action_type)
+            ):
+                scan.unguarded_destructive = True
+
+            desc_length = len(description or '')
+            if desc_length < 5:  # Too short description
+                scan.description_issues.append(f"Step {i+1}: Description too short")
+            if desc_length > 500:  # Too long description
+                scan.description_issues.append(f"Step {i+1}: Description too long")
+
+        scan.complexity = min(scan.complexity, 10.0)
+        return scan
+
     def _count_plan_steps(self, plan: Any) -> int:
         """Count steps in original plan"""
         if hasattr(plan, 'steps') and isinstance(plan.steps, list):
@@ -400,114 +533,28 @@ class SOPEvaluator(LoggerMixin):
         elif hasattr(plan, '__dict__') and 'steps' in plan.__dict__:
             return len(plan.steps)
         return 0
-    
-    def _check_step_completeness(self, step: SOPStep) -> Dict[str, Any]:
-        """Check if a step has all required components"""
-        required_fields = ['step_number', 'description', 'action_type']
-        missing_fields = []
-        
-        for field in required_fields:
-            if not hasattr(step, field) or getattr(step, field) is None:
-                missing_fields.append(field)
-        
+
+    def _analyze_step_efficiency(self, scan: StepScan) -> Dict[str, Any]:
+        """Analyze step efficiency and identify redundancies"""
+        # Redundant steps: same action as an earlier step
         return {
-            "all_required": len(missing_fields) == 0,
-            "missing_fields": missing_fields
+            "redundant_steps": sum(scan.action_counts.values()) - len(scan.action_counts),
+            "meaningless_steps": scan.meaningless_steps,
+            "total_steps": scan.step_count
         }
     
-    def _check_parameter_completeness(self, sop: SOP) -> List[str]:
-        """Check if steps have necessary parameters for their tools"""
-        issues = []
-        
-        for i, step in enumerate(sop.steps or []):
-            action_type = getattr(step, 'action_type', None)
-            params = getattr(step, 'params', {})
-            
-            if action_type and len(action_type) >= 2:
-                tool_name = action_type[1]
-                # Basic parameter checks based on tool type
-                if tool_name == "create_file" and not params.get('filename'):
-                    issues.append(f"Step {i+1}: create_file missing 'filename' parameter")
-                elif tool_name == "edit_file" and not params.get('filename'):
-                    issues.append(f"Step {i+1}: edit_file missing 'filename' parameter")
-        
-        return issues
-    
-    def _analyze_step_efficiency(self, sop: SOP) -> Dict[str, Any]:
-        """Analyze step efficiency and identify redundancies"""
-        analysis = {
-            "redundant_steps": 0,
-            "meaningless_steps": 0,
-            "total_steps": len(sop.steps or [])
-        }
-        
-        step_descriptions = []
-        step_actions = []
-        
-        for step in sop.steps or []:
-            desc = getattr(step, 'description', '').lower()
-            action = getattr(step, 'action_type', [])
-            
-            step_descriptions.append(desc)
-            if action:
-                step_actions.append(tuple(action))
-            
-            # Check for meaningless steps
-            meaningless_indicators = ['test', 'debug', 'nothing', 'empty', 'skip']
-            if any(indicator in desc for indicator in meaningless_indicators):
-                analysis["meaningless_steps"] += 1
-        
-        # Check for redundant steps (same action and similar description)
-        unique_actions = set(step_actions)
-        analysis["redundant_steps"] = len(step_actions) - len(unique_actions)
-        
-        return analysis
-    
-    def _analyze_parameter_efficiency(self, sop: SOP) -> Dict[str, Any]:
+    def _analyze_parameter_efficiency(self, scan: StepScan) -> Dict[str, Any]:
         """Analyze parameter usage efficiency"""
-        analysis = {
-            "excessive_parameters": 0,
-            "average_params_per_step": 0
+        return {
+            "excessive_parameters": scan.excessive_parameters,
+            "average_params_per_step": scan.param_total / scan.step_count if scan.step_count else 0
         }
-        
-        total_params = 0
-        param_counts = []
-        
-        for step in sop.steps or []:
-            params = getattr(step, 'params', {})
-            param_count = len(params)
-            param_counts.append(param_count)
-            total_params += param_count
-            
-            # Consider more than 5 parameters as excessive
-            if param_count > 5:
-                analysis["excessive_parameters"] += 1
-        
-        if param_counts:
-            analysis["average_params_per_step"] = sum(param_counts) / len(param_counts)
-        
-        return analysis
     
-    def _calculate_complexity(self, sop: SOP) -> float:
+    def _calculate_complexity(self, scan: StepScan) -> float:
         """Calculate SOP complexity score"""
-        complexity = 0.0
-        
-        if not sop.steps:
-            return 0.0
-        
-        # Base complexity from step count
-        complexity += min(len(sop.steps) * 0.5, 5.0)
-        
-        # Additional complexity from conditions and preconditions
-        for step in sop.steps:
-            if getattr(step, 'preconditions', None):
-                complexity += len(step.preconditions) * 0.3
-            if getattr(step, 'condition', None):
-                complexity += 1.0
-        
-        return min(complexity, 10.0)
+        return scan.complexity
     
-    def _validate_tools_exist(self, sop: SOP) -> Dict[str, Any]:
+    def _validate_tools_exist(self, scan: StepScan) -> Dict[str, Any]:
         """Validate that all referenced tools actually exist"""
         validation = {
             "fake_tools": [],
@@ -515,66 +562,29 @@ class SOPEvaluator(LoggerMixin):
             "tool_coverage": 0.0
         }
         
-        total_tools = 0
-        valid_tools = 0
-        
-        for step in sop.steps or []:
-            action_type = getattr(step, 'action_type', None)
-            if action_type and len(action_type) >= 2:
-                tool_name = action_type[1]
-                total_tools += 1
-                
-                if tool_name in self.available_tools:
-                    valid_tools += 1
-                    validation["valid_tools"].append(tool_name)
-                else:
-                    validation["fake_tools"].append(tool_name)
+        for tool_name in scan.tool_names:
+            if tool_name in self._available_tools:
+                validation["valid_tools"].append(tool_name)
+            else:
+                validation["fake_tools"].append(tool_name)
         
-        if total_tools > 0:
-            validation["tool_coverage"] = valid_tools / total_tools
+        if scan.tool_names:
+            validation["tool_coverage"] = len(validation["valid_tools"]) / len(scan.tool_names)
         
         return validation
     
-    def _check_tool_parameter_compatibility(self, sop: SOP) -> Dict[str, Any]:
+    def _check_tool_parameter_compatibility(self, scan: StepScan) -> Dict[str, Any]:
         """Check if step parameters are compatible with tool requirements"""
-        analysis = {
-            "incompatible_steps": 0,
-            "compatibility_issues": []
+        return {
+            "incompatible_steps": len(scan.compatibility_issues),
+            "compatibility_issues": list(scan.compatibility_issues)
         }
-        
-        for i, step in enumerate(sop.steps or []):
-            action_type = getattr(step, 'action_type', None)
-            params = getattr(step, 'params', {})
-            
-            if action_type and len(action_type) >= 2:
-                tool_name = action_type[1]
-                
-                # Basic compatibility checks
-                if tool_name == "create_file":
-                    if not params.get('filename') or not params.get('content'):
-                        analysis["incompatible_steps"] += 1
-                        analysis["compatibility_issues"].append(
-                            f"Step {i+1}: create_file missing required parameters"
-                        )
-                elif tool_name == "edit_file":
-                    if not params.get('filename'):
-                        analysis["incompatible_steps"] += 1
-                        analysis["compatibility_issues"].append(
-                            f"Step {i+1}: edit_file missing 'filename' parameter"
-                        )
-        
-        return analysis
-    
-    def _evaluate_resilience(self, sop: SOP) -> float:
+    
+    def _evaluate_resilience(self, scan: StepScan) -> float:
         """Evaluate resilience to tool changes"""
         resilience_score = 8.0  # Start with good score
         
-        tool_usage = {}
-        for step in sop.steps or []:
-            action_type = getattr(step, 'action_type', None)
-            if action_type and len(action_type) >= 2:
-                tool_name = action_type[1]
-                tool_usage[tool_name] = tool_usage.get(tool_name, 0) + 1
+        tool_usage = scan.tool_usage
         
         # Penalize over-reliance on single tools
         for tool, count in tool_usage.items():
@@ -582,35 +592,21 @@ class SOPEvaluator(LoggerMixin):
                 resilience_score -= 1.0
         
         # Check for alternative approaches
-        has_alternatives = len(set(tool_usage.keys())) > 1
-        if not has_alternatives and len(sop.steps or []) > 1:
+        has_alternatives = len(tool_usage) > 1
+        if not has_alternatives and scan.step_count > 1:
             resilience_score -= 2.0
         
         return max(0, resilience_score)
     
-    def _check_error_handling(self, sop: SOP) -> Dict[str, Any]:
+    def _check_error_handling(self, scan: StepScan) -> Dict[str, Any]:
         """Check error handling in SOP"""
-        analysis = {
-            "has_preconditions": False,
-            "has_conditions": False,
-            "error_handling_steps": 0
+        return {
+            "has_preconditions": scan.has_preconditions,
+            "has_conditions": scan.has_conditions,
+            "error_handling_steps": scan.error_handling_steps
         }
-        
-        for step in sop.steps or []:
-            if getattr(step, 'preconditions', None):
-                analysis["has_preconditions"] = True
-            if getattr(step, 'condition', None):
-                analysis["has_conditions"] = True
-            
-            # Check for error handling in description
-            desc = getattr(step, 'description', '').lower()
-            error_keywords = ['error', 'fail', 'check', 'validate', 'verify']
-            if any(keyword in desc for keyword in error_keywords):
-                analysis["error_handling_steps"] += 1
-        
-        return analysis
-    
-    def _check_prompt_compliance(self, sop: SOP, prompt_used: str) -> Dict[str, Any]:
+    
+    def _check_prompt_compliance(self, sop: SOP, prompt_used: str, scan: StepScan) -> Dict[str, Any]:
         """Check if SOP follows prompt instructions"""
         compliance = {
             "follows_instructions": True,
@@ -620,7 +616,7 @@ class SOPEvaluator(LoggerMixin):
         # Check for basic prompt requirements
         prompt_lower = prompt_used.lower()
         
-        if "json" in prompt_lower and not self._is_valid_json_structure(sop):
+        if "json" in prompt_lower and not self._is_valid_json_structure(scan):
             compliance["follows_instructions"] = False
             compliance["instruction_violations"].append("Not valid JSON structure")
         
@@ -630,7 +626,7 @@ class SOPEvaluator(LoggerMixin):
         
         return compliance
     
-    def _check_format_compliance(self, sop: SOP) -> Dict[str, Any]:
+    def _check_format_compliance(self, scan: StepScan) -> Dict[str, Any]:
         """Check output format compliance"""
         compliance = {
             "format_violations": 0,
@@ -638,23 +634,17 @@ class SOPEvaluator(LoggerMixin):
         }
         
         # Check step numbering
-        step_numbers = [step.step_number for step in sop.steps or [] if hasattr(step, 'step_number')]
-        if step_numbers:
-            expected_numbers = list(range(1, len(step_numbers) + 1))
-            if step_numbers != expected_numbers:
-                compliance["format_violations"] += 1
-                compliance["format_issues"].append("Step numbering is not sequential")
+        if not scan.sequential_numbering:
+            compliance["format_violations"] += 1
+            compliance["format_issues"].append("Step numbering is not sequential")
         
         # Check action_type format
-        for i, step in enumerate(sop.steps or []):
-            action_type = getattr(step, 'action_type', None)
-            if action_type and (not isinstance(action_type, list) or len(action_type) < 2):
-                compliance["format_violations"] += 1
-                compliance["format_issues"].append(f"Step {i+1}: Invalid action_type format")
+        compliance["format_violations"] += len(scan.action_format_issues)
+        compliance["format_issues"].extend(scan.action_format_issues)
         
         return compliance
     
-    def _check_rule_compliance(self, sop: SOP) -> Dict[str, Any]:
+    def _check_rule_compliance(self, scan: StepScan) -> Dict[str, Any]:
         """Check non-tool rule compliance"""
         compliance = {
             "rule_violations": 0,
@@ -669,74 +659,41 @@ class SOPEvaluator(LoggerMixin):
         ]
         
         for rule_name, rule_check in rules:
-            if not rule_check(sop):
+            if not rule_check(scan):
                 compliance["rule_violations"] += 1
                 compliance["rule_issues"].append(rule_name)
         
         return compliance
     
-    def _check_instruction_following(self, sop: SOP) -> Dict[str, Any]:
+    def _check_instruction_following(self, scan: StepScan) -> Dict[str, Any]:
         """Check basic instruction following"""
-        compliance = {
-            "follows_basic_rules": True,
-            "basic_issues": []
+        return {
+            "follows_basic_rules": not scan.description_issues,
+            "basic_issues": list(scan.description_issues)
         }
-        
-        # Check for reasonable descriptions
-        for i, step in enumerate(sop.steps or []):
-            desc = getattr(step, 'description', '')
-            if len(desc) < 5:  # Too short description
-                compliance["follows_basic_rules"] = False
-                compliance["basic_issues"].append(f"Step {i+1}: Description too short")
-            
-            if len(desc) > 500:  # Too long description
-                compliance["follows_basic_rules"] = False
-                compliance["basic_issues"].append(f"Step {i+1}: Description too long")
-        
-        return compliance
     
-    def _is_valid_json_structure(self, sop: SOP) -> bool:
+    def _is_valid_json_structure(self, scan: StepScan) -> bool:
         """Check if SOP has valid JSON structure"""
-        try:
-            sop_dict = sop.dict()
-            json_str = json.dumps(sop_dict)
-            return True
-        except:
-            return False
+        return scan.json_error is None
     
-    def _check_destructive_operations(self, sop: SOP) -> bool:
+    def _check_destructive_operations(self, scan: StepScan) -> bool:
         """Check if destructive operations have proper safeguards"""
-        destructive_tools = ['delete_file', 'remove', 'drop', 'truncate']
-        
-        for step in sop.steps or []:
-            action_type = getattr(step, 'action_type', [])
-            if any(tool in action_type for tool in destructive_tools):
-                if not getattr(step, 'preconditions', None) and not getattr(step, 'condition', None):
-                    return False
-        return True
+        return not scan.unguarded_destructive
     
-    def _check_infinite_loops(self, sop: SOP) -> bool:
+    def _check_infinite_loops(self, scan: StepScan) -> bool:
         """Check for potential infinite loops"""
         # Basic check - if same action repeats too many times
-        action_counts = {}
-        for step in sop.steps or []:
-            action_type = getattr(step, 'action_type', [])
-            if action_type:
-                action_key = tuple(action_type)
-                action_counts[action_key] = action_counts.get(action_key, 0) + 1
-                if action_counts[action_key] > 5:  # Same action repeated too many times
-                    return False
-        return True
+        return max(scan.action_counts.values(), default=0) <= 5
     
-    def _check_step_limits(self, sop: SOP) -> bool:
+    def _check_step_limits(self, scan: StepScan) -> bool:
         """Check if step count is reasonable"""
-        return len(sop.steps or []) <= 50  # Reasonable limit
+        return scan.step_count <= 50  # Reasonable limit
     
-    def _calculate_overall_score(self, dimension_scores: Dict[EvaluationDimension, DimensionScore]) -> float:
+    def _calculate_overall_score(self, dimension_results: List[DimensionScore]) -> float:
         """Calculate weighted overall score"""
         weighted_sum = sum(
-            score.score * self.dimension_weights[dimension]
-            for dimension, score in dimension_scores.items()
+            result.score * weight
+            for result, weight in zip(dimension_results, self._weights_tuple)
         )
         return round(weighted_sum, 2)
     
@@ -746,10 +703,11 @@ class SOPEvaluator(LoggerMixin):
         failed_checks = []
         
         for dimension, score_obj in dimension_scores.items():
+            label = f"{_DIM_LABELS[dimension]}: {score_obj.score}/10"
             if score_obj.score >= 7.0:
-                passed_checks.append(f"{dimension.value}: {score_obj.score}/10")
+                passed_checks.append(label)
             else:
-                failed_checks.append(f"{dimension.value}: {score_obj.score}/10")
+                failed_checks.append(label)
                 
             # Add specific issues to failed checks
             failed_checks.extend(score_obj.issues)
@@ -760,22 +718,24 @@ class SOPEvaluator(LoggerMixin):
         """Generate prioritized recommendations"""
         recommendations = []
         
-        for dimension, score_obj in dimension_scores.items():
+        for score_obj in dimension_scores.values():
             if score_obj.score < 7.0 and score_obj.issues:
-                # Get the most critical issue
-                critical_issue = score_obj.issues[0] if score_obj.issues else "Needs improvement"
+                # Issue đầu tiên là issue quan trọng nhất (evaluator ghi theo thứ tự check)
                 priority = "HIGH" if score_obj.score < 5.0 else "MEDIUM"
-                recommendations.append((f"Fix {critical_issue}", priority))
+                recommendations.append((f"Fix {score_obj.issues[0]}", priority))
+                # Limit to top 3 recommendations
+                if len(recommendations) == 3:
+                    break
         
-        # Limit to top 3 recommendations
-        return recommendations[:3]
+        return recommendations
 
 
 # ===== USAGE EXAMPLE =====
 async def demo_sop_evaluation():
     """Demo SOP evaluation"""
     
-    # Get available tools
+    # Get available tools (registry chỉ đầy sau khi auto_discover import các group)
+    BaseTool.auto_discover()
     available_tools = BaseTool.list_tools()
     
     # Create evaluator
@@ -1,6 +1,7 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from src.handler.system_handler import SystemHandler
 
@@ -11,6 +12,8 @@ class ErrorType(str, Enum):
     PERMISSION_ERROR = "PERMISSION_ERROR"
     TOOL_ERROR = "TOOL_ERROR"
     SYSTEM_ERROR = "SYSTEM_ERROR"
+    RATE_LIMIT_ERROR = "RATE_LIMIT_ERROR"
+    TRANSIENT_ERROR = "TRANSIENT_ERROR"
 
 
 class ErrorSeverity(str, Enum):
@@ -19,13 +22,63 @@ class ErrorSeverity(str, Enum):
     FATAL = "FATAL"               
 
 
-@dataclass
+# Exception của SDK provider (groq/openai/httpx) cho lỗi mạng/timeout — so theo tên
+# để không phải import SDK ở đây
+_TRANSIENT_EXCEPTION_NAMES = frozenset({
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "ConnectError",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "RemoteProtocolError",
+})
+
+
+# Phần cố định của AgentError theo loại lỗi: (error_type, severity, message)
+# message None → dùng str(exc)
+_NOT_FOUND_RULE = (ErrorType.IO_ERROR, ErrorSeverity.RECOVERABLE, "File not found")
+_PERMISSION_RULE = (ErrorType.PERMISSION_ERROR, ErrorSeverity.ESCALATE, "Permission denied")
+# Provider / network errors (retry được sau khi chờ)
+_RATE_LIMIT_RULE = (ErrorType.RATE_LIMIT_ERROR, ErrorSeverity.RECOVERABLE, None)
+_TRANSIENT_RULE = (ErrorType.TRANSIENT_ERROR, ErrorSeverity.RECOVERABLE, None)
+# Known runtime / tool errors
+_RUNTIME_RULE = (ErrorType.RUNTIME_ERROR, ErrorSeverity.RECOVERABLE, None)
+# Fallback (unknown)
+_UNKNOWN_RULE = (ErrorType.SYSTEM_ERROR, ErrorSeverity.FATAL, None)
+
+
+@lru_cache(maxsize=256)
+def _classify_type(exc_type: type) -> Tuple[ErrorType, ErrorSeverity, Optional[str]]:
+    """
+    Phân loại theo class của exception (thứ tự ưu tiên như cũ), cache theo type →
+    các lỗi lặp lại cùng loại chỉ tốn 1 lần tra cache thay vì chuỗi isinstance.
+    """
+    if issubclass(exc_type, FileNotFoundError):
+        return _NOT_FOUND_RULE
+    if issubclass(exc_type, PermissionError):
+        return _PERMISSION_RULE
+
+    name = exc_type.__name__
+    if "RateLimit" in name:
+        return _RATE_LIMIT_RULE
+    if issubclass(exc_type, (TimeoutError, ConnectionError)) or name in _TRANSIENT_EXCEPTION_NAMES:
+        return _TRANSIENT_RULE
+
+    if issubclass(exc_type, ValueError):
+        return _RUNTIME_RULE
+    return _UNKNOWN_RULE
+
+
+# Immutable + slots: không có __dict__ per instance, hashable để dedup lỗi
+@dataclass(slots=True, frozen=True)
 class AgentError:
     error_type: ErrorType
     severity: ErrorSeverity
     message: str
     source: str
-    raw_exception: Optional[Exception] = None
+    # Exception không hashable/so sánh ổn định → bỏ khỏi eq/hash
+    raw_exception: Optional[Exception] = field(default=None, compare=False, hash=False)
 
 
 class ErrorHandler(SystemHandler):
@@ -38,10 +91,22 @@ class ErrorHandler(SystemHandler):
     - Emit deterministic signals for Executor / Controller
     """
 
+    _shared: Optional["ErrorHandler"] = None
+
     def __init__(self):
         super().__init__()
         self.info("ErrorHandler initialized")
 
+    @classmethod
+    def shared(cls) -> "ErrorHandler":
+        """
+        Instance dùng chung cho mọi agent: handler không giữ state nên không cần
+        tạo (và log init) lại cho từng agent.
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
     # ---------- Exception normalization ----------
 
     def handle_exception(self, exc: Exception, source: str) -> AgentError:
@@ -50,40 +115,21 @@ class ErrorHandler(SystemHandler):
         """
         self.error(f"[{source}] Exception: {exc}")
 
-        # ---- IO errors ----
-        if isinstance(exc, FileNotFoundError):
-            return AgentError(
-                error_type=ErrorType.IO_ERROR,
-                severity=ErrorSeverity.RECOVERABLE,
-                message="File not found",
-                source=source,
-                raw_exception=exc
-            )
-
-        if isinstance(exc, PermissionError):
-            return AgentError(
-                error_type=ErrorType.PERMISSION_ERROR,
-                severity=ErrorSeverity.ESCALATE,
-                message="Permission denied",
-                source=source,
-                raw_exception=exc
-            )
-
-        # ---- Known runtime / tool errors ----
-        if isinstance(exc, ValueError):
-            return AgentError(
-                error_type=ErrorType.RUNTIME_ERROR,
-                severity=ErrorSeverity.RECOVERABLE,
-                message=str(exc),
-                source=source,
-                raw_exception=exc
-            )
-
-        # ---- Fallback (unknown) ----
+        rule = _classify_type(type(exc))
+
+        # ---- Provider / network errors theo status_code (thuộc instance, không cache được) ----
+        if rule is not _NOT_FOUND_RULE and rule is not _PERMISSION_RULE:
+            status_code = getattr(exc, "status_code", None)
+            if status_code == 429:
+                rule = _RATE_LIMIT_RULE
+            elif rule is not _RATE_LIMIT_RULE and isinstance(status_code, int) and status_code >= 500:
+                rule = _TRANSIENT_RULE
+
+        error_type, severity, message = rule
         return AgentError(
-            error_type=ErrorType.SYSTEM_ERROR,
-            severity=ErrorSeverity.FATAL,
-            message=str(exc),
+            error_type=error_type,
+            severity=severity,
+            message=message or str(exc),
             source=source,
             raw_exception=exc
         )
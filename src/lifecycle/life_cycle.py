@@ -1,3 +1,7 @@
+import asyncio
+from functools import cache, cached_property
+
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
 from src.utils.logger import LoggerMixin
 from src.agent.planner_agent import PlannerAgent
@@ -10,36 +14,75 @@ from src.agent.simple_math_agent import SimpleMathAgent
 from src.tools.base_tool import BaseTool
 from src.llm.groq_client import GroqClient
 from src.llm.ollama_client import OllamaClient
-from src.models.models import StateSchema, ExecutionState, ExecutionStatus
+from src.models.models import CriticFeedback, StateSchema, ExecutionState, ExecutionStatus
 from src.middleware.HITL_middleware import HITL, HITLMiddleware
 
 class LifeCycle(LoggerMixin):
 
     MAX_PLAN_RETRY = 3
 
+    # Path map của các conditional edge (router trả về key → node đích)
+    START_ROUTES = {"planner": "planner", "executor": "executor"}
+    PLANNING_ROUTES = {"planner": "planner", "sop_dispatch": "sop_dispatch", END: END}
+    EXECUTOR_ROUTES = {"resume": "resume", END: END}
+
+    # Components mang execution_id theo segment_id của run hiện tại
+    SEGMENT_COMPONENTS = ("planner", "critic", "sop_agent", "executor", "crud", "math")
+
     def __init__(self):
         super().__init__("LifeCycle")
         self.info("lifecycle_initializing")
 
-        self.llm = GroqClient()
-        self.llm_ollama = OllamaClient()
-
-        # Agents sẽ được khởi tạo lại với segment_id khi cần
-        self.planner = PlannerAgent(llm=self.llm)
-        self.critic = PlanCriticAgent(llm=self.llm)
-        self.sop_agent = SOPAgent(llm=self.llm)
-
-        self.base_tool = BaseTool()
-        self.base_tool.auto_discover("src.tools.group")
-
-        self.crud = CRUDAgent(llm=self.llm_ollama)
-        self.crud.register_tool(self.base_tool.get_tools_by_group("file"))
-
-        self.math = SimpleMathAgent(llm=self.llm_ollama)
-        self.math.register_tool(self.base_tool.get_tools_by_group("math"))
-
-        self.dispatcher = SOPStepDispatcher(sop_agent=self.sop_agent, agents=[self.crud, self.math])
-        
+    # ------------------------------------------------------------
+    # Components: khởi tạo lazy ở lần truy cập đầu tiên (thường là run() đầu tiên),
+    # không tốn chi phí dựng client/agent/graph khi chỉ import hoặc tạo LifeCycle.
+    # Dựng hoàn toàn đồng bộ (không có await) nên không cần lock.
+    # ------------------------------------------------------------
+    @cached_property
+    def llm(self):
+        return GroqClient()
+
+    @cached_property
+    def llm_ollama(self):
+        return OllamaClient()
+
+    # Agent dựng sau khi run() đã set segment_id nhận luôn execution_id qua _with_segment
+    @cached_property
+    def planner(self):
+        return self._with_segment(PlannerAgent(llm=self.llm))
+
+    @cached_property
+    def critic(self):
+        return self._with_segment(PlanCriticAgent(llm=self.llm))
+
+    @cached_property
+    def sop_agent(self):
+        return self._with_segment(SOPAgent(llm=self.llm))
+
+    @cached_property
+    def base_tool(self):
+        base_tool = BaseTool()
+        base_tool.auto_discover("src.tools.group")
+        return base_tool
+
+    @cached_property
+    def crud(self):
+        crud = CRUDAgent(llm=self.llm_ollama)
+        crud.register_tool(self.base_tool.get_callables_by_group("file"))
+        return self._with_segment(crud)
+
+    @cached_property
+    def math(self):
+        math = SimpleMathAgent(llm=self.llm_ollama)
+        math.register_tool(self.base_tool.get_callables_by_group("math"))
+        return self._with_segment(math)
+
+    @cached_property
+    def dispatcher(self):
+        return SOPStepDispatcher(sop_agent=self.sop_agent, agents=[self.crud, self.math])
+
+    @cached_property
+    def executor(self):
         hitl = HITL(
             tools=[
                 "delete_file",
@@ -49,254 +92,264 @@ class LifeCycle(LoggerMixin):
         
         hitl_middleware = HITLMiddleware(hitl)
 
-        self.executor = ExecutorAgent(middleware=[
+        executor = ExecutorAgent(middleware=[
             hitl_middleware
         ])
-        self.executor.register_agent(self.crud)
-        self.executor.register_agent(self.math)
+        executor.register_agent(self.crud)
+        executor.register_agent(self.math)
+        return self._with_segment(executor)
+
+    def _with_segment(self, component):
+        if self.execution_id:
+            component.execution_id = self.execution_id
+        return component
+
+    @cached_property
+    def workflow(self):
+        return self._compiled_graph()
+
+    # ------------------------------------------------------------
+    # GRAPH: topology không phụ thuộc instance → compile 1 lần cho cả class.
+    # Node là adapter lấy LifeCycle hiện tại từ config["configurable"]["lifecycle"].
+    # ------------------------------------------------------------
+    @classmethod
+    @cache
+    def _compiled_graph(cls):
+        return cls._build_graph()
+
+    @classmethod
+    def _build_graph(cls):
+
+        def _node(method_name: str):
+            if asyncio.iscoroutinefunction(getattr(cls, method_name)):
+                async def node(state: StateSchema, config: RunnableConfig):
+                    return await getattr(config["configurable"]["lifecycle"], method_name)(state)
+            else:
+                def node(state: StateSchema, config: RunnableConfig):
+                    return getattr(config["configurable"]["lifecycle"], method_name)(state)
+            return node
 
-        self.workflow = self._build_graph()
+        graph = StateGraph(state_schema=StateSchema)
 
-    def _build_graph(self):
+        graph.add_node("planner", _node("_planner_node"))
+        graph.add_node("critic", _node("_critic_node"))
+        graph.add_node("sop_dispatch", _node("_sop_dispatch_node"))
+        graph.add_node("executor", _node("_executor_node"))
+        graph.add_node("resume", _node("_resume_node"))
 
-        graph = StateGraph(state_schema=StateSchema)
-        
-        def route_from_start(state: StateSchema):
-            self.debug("router_start", is_resume=state.is_resume)
-            if state.is_resume:
-                self.info("router_resume_detected", route="executor")
-                return "executor"
-            self.info("router_fresh_run", route="planner")
-            return "planner"
-
-
-
-        async def planner_node(state: StateSchema):
-            self.info("planner_node_enter")
-
-            if state.critic:
-                self.warning(
-                    "planner_replanning",
-                    retry=state.retry + 1,
-                    error_message=state.critic.get("error_message", "")
-                )
-                plan = await self.planner.invoke(
-                    state.user_request,
-                    error_message=state.critic.get("error_message", ""),
-                    attempt=state.retry + 1
-                )
-            else:
-                self.debug("planner_first_attempt")
-                plan = await self.planner.invoke(state.user_request)
+        graph.add_conditional_edges(
+            START,
+            _node("_route_from_start"),
+            cls.START_ROUTES
+        )
+        graph.add_edge("planner", "critic")
 
-            state.plan = plan
-            self.info("planner_plan_generated", steps_count=len(plan.steps))
-            self.debug("planner_plan_details", steps=plan.steps)
-            return state
+        graph.add_conditional_edges(
+            "critic",
+            _node("_route_planning"),
+            cls.PLANNING_ROUTES
+        )
 
+        graph.add_edge("sop_dispatch", "executor")
 
-        async def critic_node(state: StateSchema):
-            self.info("critic_node_evaluating")
+        graph.add_conditional_edges(
+            "executor",
+            _node("_route_after_executor"),
+            cls.EXECUTOR_ROUTES
+        )
 
-            critic_resp = await self.critic.invoke(
-                plan=state.plan,
-                query=state.user_request
+        graph.add_edge("resume", "executor")
+
+        return graph.compile()
+
+    # ------------------------------------------------------------
+    # NODES / ROUTERS
+    # ------------------------------------------------------------
+    def _route_from_start(self, state: StateSchema):
+        self.debug("router_start", is_resume=state.is_resume)
+        if state.is_resume:
+            self.info("router_resume_detected", route="executor")
+            return "executor"
+        self.info("router_fresh_run", route="planner")
+        return "planner"
+
+    async def _planner_node(self, state: StateSchema):
+        self.info("planner_node_enter")
+
+        if state.critic:
+            error_message = self._critic_error_message(state.critic)
+            self.warning(
+                "planner_replanning",
+                retry=state.retry + 1,
+                error_message=error_message
+            )
+            plan = await self.planner.invoke(
+                state.user_request,
+                error_message=error_message,
+                attempt=state.retry + 1
             )
+        else:
+            self.debug("planner_first_attempt")
+            plan = await self.planner.invoke(state.user_request)
 
-            critic_obj = critic_resp.get("feedback")
-            critic = critic_obj.model_dump() if critic_obj else {}
+        state.plan = plan
+        self.info("planner_plan_generated", steps_count=len(plan.steps))
+        self.debug("planner_plan_details", steps=plan.steps)
+        return state
 
-            score = critic.get("score", 0)
-            self.info("critic_score", score=score)
+    async def _critic_node(self, state: StateSchema):
+        self.info("critic_node_evaluating")
 
-            if score < 100:
-                self.warning("critic_plan_rejected", score=score)
+        critic_resp = await self.critic.invoke(
+            plan=state.plan,
+            query=state.user_request
+        )
 
-            state.critic = critic
-            return state
+        critic = critic_resp.get("feedback")
 
+        score = critic.score if critic else 0
+        self.info("critic_score", score=score)
 
-        def route_planning(state: StateSchema):
-            score = state.critic.get("score", 0)
-            retry = state.retry
+        if score < 100:
+            self.warning("critic_plan_rejected", score=score)
 
-            self.debug(
-                "route_planning",
-                score=score,
-                retry=retry,
-                max_retry=self.MAX_PLAN_RETRY
-            )
+        state.critic = critic
+        return state
 
-            if score == 100:
-                self.info("route_planning_accepted", route="sop_dispatch")
-                return "sop_dispatch"
+    def _route_planning(self, state: StateSchema):
+        score = state.critic.score if state.critic else 0
+        retry = state.retry
 
-            if retry + 1 >= self.MAX_PLAN_RETRY:
-                self.error("route_planning_max_retry_exceeded", route="stop")
-                return "stop"
+        self.debug(
+            "route_planning",
+            score=score,
+            retry=retry,
+            max_retry=self.MAX_PLAN_RETRY
+        )
 
-            state.retry += 1
-            self.warning("route_planning_retry", route="planner")
-            return "planner"
+        if score == 100:
+            self.info("route_planning_accepted", route="sop_dispatch")
+            return "sop_dispatch"
 
-        async def sop_dispatch_node(state: StateSchema):
-            self.info("sop_dispatch_building")
+        if retry + 1 >= self.MAX_PLAN_RETRY:
+            self.error("route_planning_max_retry_exceeded", route="END")
+            return END
 
-            sop = await self.dispatcher.build_sop(state.plan)
-            state.sop = sop
+        state.retry += 1
+        self.warning("route_planning_retry", route="planner")
+        return "planner"
 
-            self.info("sop_dispatch_built", steps_count=len(sop.steps))
-            return state
+    async def _sop_dispatch_node(self, state: StateSchema):
+        self.info("sop_dispatch_building")
 
+        sop = await self.dispatcher.build_sop(state.plan)
+        state.sop = sop
 
-        async def executor_node(state: StateSchema):
-            self.info("executor_node_enter")
+        self.info("sop_dispatch_built", steps_count=len(sop.steps))
+        return state
 
-            if state.is_resume:
-                self.info("executor_resume_execution")
+    async def _executor_node(self, state: StateSchema):
+        self.info("executor_node_enter")
 
-                result = await self.executor.run_sop(
-                    state.sop,
-                    resume_context=state.exec_result.context,
-                    resume_step_results=state.exec_result.steps,
-                )
+        if state.is_resume:
+            self.info("executor_resume_execution")
 
-                state.exec_result = result
-                state.is_resume = False
-                return state
+            result = await self.executor.run_sop(
+                state.sop,
+                resume_context=state.exec_result.context,
+                resume_step_results=state.exec_result.steps,
+            )
 
-            self.info("executor_fresh_execution")
-            result = await self.executor.run_sop(state.sop)
             state.exec_result = result
+            state.is_resume = False
             return state
 
+        self.info("executor_fresh_execution")
+        result = await self.executor.run_sop(state.sop)
+        state.exec_result = result
+        return state
 
-        def route_after_executor(state: StateSchema):
-            result = state.exec_result
-
-            if not result:
-                self.debug("route_after_executor_no_result", route="END")
-                return END
-
-            if result.state == ExecutionState.PENDING_HITL:
-                if state.hitl_decision is not None:
-                    self.info("route_after_executor_hitl_decision", route="resume", decision=state.hitl_decision)
-                    return "resume"
+    def _route_after_executor(self, state: StateSchema):
+        result = state.exec_result
 
-                self.warning("route_after_executor_waiting_hitl", route="END")
-                return END
-
-            self.info("route_after_executor_finished", route="END", state=result.state.value)
+        if not result:
+            self.debug("route_after_executor_no_result", route="END")
             return END
 
-        async def resume_node(state: StateSchema):
-            decision = state.hitl_decision
-            exec_result = state.exec_result
-
-            self.info("resume_node_hitl_decision", decision=decision)
+        if result.state == ExecutionState.PENDING_HITL:
+            if state.hitl_decision is not None:
+                self.info("route_after_executor_hitl_decision", route="resume", decision=state.hitl_decision)
+                return "resume"
 
-            if decision == "reject":
-                self.warning(
-                    "resume_node_hitl_rejected",
-                    tool=exec_result.tool_name,
-                    step_number=exec_result.current_step_idx + 1
-                )
+            self.warning("route_after_executor_waiting_hitl", route="END")
+            return END
 
-                exec_result.context["hitl_skipped"] = {
-                    "tool": exec_result.tool_name,
-                    "step_number": exec_result.current_step_idx + 1,
-                }
+        self.info("route_after_executor_finished", route="END", state=result.state.value)
+        return END
 
-                exec_result.current_step_idx += 2
+    async def _resume_node(self, state: StateSchema):
+        decision = state.hitl_decision
+        exec_result = state.exec_result
 
-                state.exec_result = exec_result
-                state.hitl_decision = None
-                state.is_resume = True    
-                return state
+        self.info("resume_node_hitl_decision", decision=decision)
 
-            if decision == "approve":
-                self.info(
-                    "resume_node_hitl_approved",
-                    tool=exec_result.tool_name,
-                    step_number=exec_result.current_step_idx + 1
-                )
+        if decision == "reject":
+            self.warning(
+                "resume_node_hitl_rejected",
+                tool=exec_result.tool_name,
+                step_number=exec_result.current_step_idx + 1
+            )
 
-                exec_result.context["hitl_approved"] = {
-                    "tool": exec_result.tool_name,
-                    "step_number": exec_result.current_step_idx + 1,
-                }
+            exec_result.context["hitl_skipped"] = {
+                "tool": exec_result.tool_name,
+                "step_number": exec_result.current_step_idx + 1,
+            }
 
-                state.is_resume = True
-                state.hitl_decision = None
-                return state
+            exec_result.current_step_idx += 2
 
+            state.exec_result = exec_result
+            state.hitl_decision = None
+            state.is_resume = True    
             return state
 
-        
-        graph = StateGraph(state_schema=StateSchema)
-
-        graph.add_node("planner", planner_node)
-        graph.add_node("critic", critic_node)
-        graph.add_node("sop_dispatch", sop_dispatch_node)
-        graph.add_node("executor", executor_node)
-        graph.add_node("resume", resume_node)
-
-        graph.add_conditional_edges(
-            START,
-            route_from_start,
-            {
-                "planner": "planner",
-                "executor": "executor",
-            }
-        )
-        graph.add_edge("planner", "critic")
-
-        graph.add_conditional_edges(
-            "critic",
-            route_planning,
-            {
-                "planner": "planner",
-                "sop_dispatch": "sop_dispatch",
-                END: END
-            }
-        )
-
-        graph.add_edge("sop_dispatch", "executor")
+        if decision == "approve":
+            self.info(
+                "resume_node_hitl_approved",
+                tool=exec_result.tool_name,
+                step_number=exec_result.current_step_idx + 1
+            )
 
-        graph.add_conditional_edges(
-            "executor",
-            route_after_executor,
-            {
-                "resume": "resume",
-                END: END
+            exec_result.context["hitl_approved"] = {
+                "tool": exec_result.tool_name,
+                "step_number": exec_result.current_step_idx + 1,
             }
-        )
 
-        graph.add_edge("resume", "executor")
+            state.is_resume = True
+            state.hitl_decision = None
+            return state
 
-        return graph.compile()
+        return state
 
+    @staticmethod
+    def _critic_error_message(critic: CriticFeedback) -> str:
+        """Feedback của critic → error_message cho lần re-plan."""
+        return "; ".join(issue.description for issue in critic.issues) or critic.summary
 
     async def run(self, state: StateSchema) -> StateSchema:
         # Set segment_id cho tất cả components nếu có
         segment_id = state.segment_id
         if segment_id:
-            # Update execution_id cho các agents và executor
-            if hasattr(self.planner, 'execution_id'):
-                self.planner.execution_id = segment_id
-            if hasattr(self.critic, 'execution_id'):
-                self.critic.execution_id = segment_id
-            if hasattr(self.sop_agent, 'execution_id'):
-                self.sop_agent.execution_id = segment_id
-            if hasattr(self.executor, 'execution_id'):
-                self.executor.execution_id = segment_id
-            if hasattr(self.crud, 'execution_id'):
-                self.crud.execution_id = segment_id
-            if hasattr(self.math, 'execution_id'):
-                self.math.execution_id = segment_id
-            # Set cho LifeCycle itself
+            # Set cho LifeCycle itself → component dựng sau sẽ nhận qua _with_segment
             self.execution_id = segment_id
+            # Chỉ cập nhật components đã dựng (đọc __dict__, không kích hoạt cached_property)
+            for name in self.SEGMENT_COMPONENTS:
+                component = self.__dict__.get(name)
+                if component is not None:
+                    component.execution_id = segment_id
         
-        raw_state = await self.workflow.ainvoke(state)
+        raw_state = await self.workflow.ainvoke(
+            state,
+            config={"configurable": {"lifecycle": self}}
+        )
         return StateSchema(**raw_state)
 
@@ -1,11 +1,48 @@
 from abc import ABC, abstractmethod
 from src.utils.logger import LoggerMixin
-from src.constants.constants import MODEL_CONFIG
+from src.constants.constants import get_model_config
 from dotenv import load_dotenv
+from functools import lru_cache
+from typing import Any, Optional
+import asyncio
+import importlib.util
 import os
+import weakref
+
+import httpx
 
 load_dotenv()
 
+# Connection pool dùng chung cho mọi LLM client trong process
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20)
+# HTTP/2 cần package h2 (httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# httpx.AsyncClient gắn với event loop tạo ra nó → cache theo loop
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@lru_cache(maxsize=1)
+def shared_http_client() -> httpx.Client:
+    return httpx.Client(limits=HTTP_LIMITS, http2=HTTP2)
+
+
+def shared_async_http_client() -> Optional[httpx.AsyncClient]:
+    """AsyncClient của event loop đang chạy; None nếu gọi ngoài loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(limits=HTTP_LIMITS, http2=HTTP2)
+        _async_http_clients[loop] = client
+    return client
+
+
 class BaseClient(LoggerMixin, ABC):
     """Base class for all LLM providers."""
 
@@ -15,10 +52,11 @@ class BaseClient(LoggerMixin, ABC):
         """
         super().__init__(self.__class__.__name__)
 
-        if provider_key not in MODEL_CONFIG:
+        model_config = get_model_config()
+        if provider_key not in model_config:
             raise ValueError(f"Provider '{provider_key}' not found in MODEL_CONFIG")
 
-        self.config = MODEL_CONFIG[provider_key]  # metadata của model
+        self.config = model_config[provider_key]  # metadata của model
         self.model_name = self.config.get("model_name")
 
         # API key không lấy từ YAML — lấy từ ENV
@@ -28,9 +66,28 @@ class BaseClient(LoggerMixin, ABC):
 
         # Khởi tạo client thật của LLM provider
         self.client = self._create_client()
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
 
         self.info(f"Initialized LLM Client for provider: {provider_key}, model: {self.model_name}")
 
+    def get_or_create_client(self):
+        """
+        Client provider dùng chung cho mọi agent dùng LLM này.
+        Trong event loop → 1 client/loop (HTTP pool của loop đó), ngoài loop → self.client.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.client
+
+        client = self._loop_clients.get(loop)
+        if client is None:
+            client = self._create_client()
+            self._loop_clients[loop] = client
+        return client
+
     @abstractmethod
     def _create_client(self):
         """Khởi tạo client provider cụ thể."""
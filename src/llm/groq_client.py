@@ -1,5 +1,5 @@
 from langchain_groq import ChatGroq
-from src.llm.base import BaseClient
+from src.llm.base import BaseClient, shared_async_http_client, shared_http_client
 
 class GroqClient(BaseClient):
 
@@ -7,11 +7,14 @@ class GroqClient(BaseClient):
         super().__init__("groq") 
 
     def _create_client(self):
+        # TCP + TLS connection được giữ lại giữa các lần invoke / các agent
         return ChatGroq(
             model=self.model_name,
             groq_api_key=self.api_key,
             temperature=self.config.get("temperature", 0.2),
-            max_tokens=self.config.get("max_tokens", 2048)
+            max_tokens=self.config.get("max_tokens", 2048),
+            http_client=shared_http_client(),
+            http_async_client=shared_async_http_client(),
         )
 
     def invoke(self, query: str) -> str:
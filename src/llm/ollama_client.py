@@ -1,5 +1,5 @@
 from langchain_ollama import ChatOllama
-from src.llm.base import BaseClient
+from src.llm.base import BaseClient, HTTP_LIMITS
 
 class OllamaClient(BaseClient):
 
@@ -9,7 +9,11 @@ class OllamaClient(BaseClient):
     def _create_client(self):
         return ChatOllama(
             model=self.model_name,
-            temperature=self.config.get("temperature", 0.2)
+            temperature=self.config.get("temperature", 0.2),
+            # Model không bị unload giữa các request → Ollama tái sử dụng KV cache
+            # cho phần prefix prompt giống nhau
+            keep_alive=self.config.get("keep_alive"),
+            client_kwargs={"limits": HTTP_LIMITS},
         )
 
     def invoke(self, query: str) -> str:
@@ -15,6 +15,12 @@ class HITLMiddleware(AgentMiddleware):
     def __init__(self, hitl: HITL):
         self.hitl = hitl
 
+    def may_interrupt(self, step) -> bool:
+        # Chỉ static step mới biết trước tool; dynamic step không gọi before_tool
+        if step.execution_mode != "static" or not step.action_type:
+            return False
+        return self.hitl.requires_hitl(step.action_type.get("tool"))
+
     async def before_tool(self, step, tool_name, params, context):
         approved = context.get("hitl_approved")
 
@@ -23,7 +29,6 @@ class HITLMiddleware(AgentMiddleware):
                 approved.get("tool") == tool_name
                 and approved.get("step_number") == step.step_number
             ):
-                print("HITL approved for tool:", tool_name)
                 return
             
         skipped = context.get("hitl_skipped")
@@ -4,6 +4,10 @@ class AgentMiddleware:
     def __init__(self, *, name=None):
         self.name = name or self.__class__.__name__
 
+    def may_interrupt(self, step) -> bool:
+        """True nếu hook của middleware có thể dừng step này (vd: raise HITLRequired)."""
+        return False
+
     async def before_run(self, context): ...
     async def before_step(self, step, context): ...
     async def before_tool(self, step, tool_name, params, context): ...
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from dataclasses import dataclass, field
 import uuid
 from typing import Union
@@ -21,6 +21,9 @@ class ConversationStatus(str, Enum):
 
 class Response(BaseModel):
     """Response to user."""
+    # Immutable sau khi tạo: không cần validate_assignment, an toàn khi dùng chung/cache
+    model_config = ConfigDict(frozen=True)
+
     status: Literal["Success", "Fail"]
     result: Any = Field(
         description="Reason why Fail"
@@ -28,6 +31,7 @@ class Response(BaseModel):
 
 class Plan(BaseModel):
     """Plan to follow in future"""
+    model_config = ConfigDict(frozen=True)
 
     steps: List[str] = Field(
         description="different steps to follow, should be in sorted order"
@@ -188,6 +192,8 @@ class SOP(BaseModel):
     """
     SOP gồm nhiều step chạy theo thứ tự.
     """
+    model_config = ConfigDict(frozen=True)
+
     steps: List[SOPStep] = Field(
         ..., description="Danh sách step theo thứ tự thực thi."
     )
@@ -244,9 +250,9 @@ class ExecutionStatus:
 class StateSchema(BaseModel):
     user_request: str
     plan: Optional[Plan] = None
-    critic: Dict[str, Any] = Field(default_factory=dict)
+    critic: Optional[CriticFeedback] = None
     sop: Optional[SOP] = None
-    exec_result: ExecutionStatus = None
+    exec_result: Optional[ExecutionStatus] = None
     retry: int = 3
     
     is_resume: bool = False
@@ -1,7 +1,9 @@
 from src.utils.logger import LoggerMixin
 from src.models.models import SOP, SOPStep, Condition, ToolResponse, HITLRequired, ExecutionStatus, ExecutionState
 from src.agent.base_agent import BaseAgent
-from typing import Dict, Any
+from src.tools.base_tool import BaseTool
+from typing import Dict, Any, List, Set
+import asyncio
 import re
 from src.handler.error_handler import ErrorHandler, ErrorSeverity
 from src.middleware.middleware_manager import MiddlewareManager
@@ -17,15 +19,21 @@ class ExecutorAgent(LoggerMixin):
         "<=": lambda a, b: a <= b,
     }
 
-    def __init__(self, name="ExecutorAgent", log_dir="logs", middleware=None):
+    # Tool không có side-effect → được chạy song song với nhau (opt-in, xem concurrent)
+    READ_ONLY_TOOLS = frozenset({"read_file", "file_info", "check_file_exists", "identify_target_file"})
+    READ_ONLY_CATEGORIES = frozenset({"math"})
+
+    def __init__(self, name="ExecutorAgent", log_dir="logs", middleware=None, concurrent=False):
         super().__init__(name, log_dir)
         self.agents: Dict[str, BaseAgent] = {}
         self.context: Dict[str, Any] = {}
         self.step_results: Dict[int, ToolResponse] = {}
-        self.error_handler = ErrorHandler()
+        self.error_handler = ErrorHandler.shared()
         self.max_visits_per_step = 10
         
         self.middleware = MiddlewareManager(middleware or [])
+        # Chạy step read-only song song theo dependency graph; mặc định tắt (tuần tự)
+        self.concurrent = concurrent
 
     # ------------------------------------------------------------
     # REGISTER AGENT
@@ -158,7 +166,9 @@ class ExecutorAgent(LoggerMixin):
             last_exc = None
             for attempt in range((step.retry or 0) + 1):
                 try:
-                    out = tool_fn(**params)
+                    # Tool sync (file I/O, ...) chạy trong thread → không block event loop,
+                    # các step độc lập có thể chạy song song
+                    out = await asyncio.to_thread(tool_fn, **params)
                     resp = ToolResponse(success=True, output=out)
                     self.info(
                         "tool_execution_success",
@@ -241,6 +251,28 @@ class ExecutorAgent(LoggerMixin):
             self.step_results[step.step_number] = resp
             return resp
         
+    async def execute_step_logged(self, step: SOPStep) -> ToolResponse:
+        resp = await self.execute_step(step)
+
+        # Log step completion
+        tool_name = step.action_type.get("tool") if step.execution_mode == "static" else None
+        if resp.success:
+            self.info(
+                "step_completed",
+                step=step.step_number,
+                success=True,
+                tool=tool_name
+            )
+        else:
+            self.error(
+                "step_failed",
+                step=step.step_number,
+                tool=tool_name,
+                error=resp.error,
+                severity="RECOVERABLE"
+            )
+        return resp
+
     def resolve_template(self, template: str) -> str:
         """
         Resolve templates like:
@@ -321,6 +353,10 @@ class ExecutorAgent(LoggerMixin):
 
         await self.middleware.dispatch("before_run", self.context)
 
+        # SOP không có jump + không phải resume HITL → chạy theo dependency graph
+        if resume_context is None and self.can_run_concurrently(sop):
+            return await self.run_sop_concurrent(sop)
+
         visits = {k: 0 for k in ordered}
 
         while 0 <= cur_idx < len(ordered):
@@ -353,26 +389,7 @@ class ExecutorAgent(LoggerMixin):
                 )
 
             try:
-                resp = await self.execute_step(step)
-                
-                # Log step completion
-                if resp.success:
-                    tool_name = step.action_type.get("tool") if step.execution_mode == "static" else None
-                    self.info(
-                        "step_completed",
-                        step=step_number,
-                        success=True,
-                        tool=tool_name
-                    )
-                else:
-                    tool_name = step.action_type.get("tool") if step.execution_mode == "static" else None
-                    self.error(
-                        "step_failed",
-                        step=step_number,
-                        tool=tool_name,
-                        error=resp.error,
-                        severity="RECOVERABLE"
-                    )
+                resp = await self.execute_step_logged(step)
 
             except HITLRequired as hitl:
                 self.warning(
@@ -450,3 +467,168 @@ class ExecutorAgent(LoggerMixin):
             context=self.context,
         )
 
+    # ------------------------------------------------------------
+    # CONCURRENT (DAG) EXECUTION
+    # ------------------------------------------------------------
+    PLACEHOLDER = re.compile(r"<([a-zA-Z_][a-zA-Z0-9_]*)")
+
+    def can_run_concurrently(self, sop: SOP) -> bool:
+        # Jump làm thứ tự chạy phụ thuộc runtime → giữ đường tuần tự
+        return (
+            self.concurrent
+            and len(sop.steps) > 1
+            and not any(s.condition_to_jump_step for s in sop.steps)
+        )
+
+    def may_interrupt(self, step: SOPStep) -> bool:
+        """Step có thể bị middleware dừng lại (HITL) → phải chạy 1 mình."""
+        return any(m.may_interrupt(step) for m in self.middleware.middlewares if hasattr(m, "may_interrupt"))
+
+    def is_read_only(self, step: SOPStep) -> bool:
+        """
+        Chỉ step static gọi tool read-only mới được chạy song song.
+        Step dynamic (LLM tự chọn tool) hoặc tool có side-effect → barrier.
+        """
+        if step.execution_mode != "static" or not step.action_type:
+            return False
+        tool = step.action_type.get("tool")
+        if tool in self.READ_ONLY_TOOLS:
+            return True
+        return BaseTool.metadata.get(tool, {}).get("category") in self.READ_ONLY_CATEGORIES
+
+    def build_dependencies(self, steps: List[SOPStep]) -> Dict[int, Set[int]]:
+        """
+        step_number → các step đứng trước mà step này phải chờ:
+        - conditions[].step
+        - placeholder <var> trỏ tới store_result_as của step trước
+        - cùng ghi 1 biến store_result_as
+        - dùng chung literal string param (vd: cùng filename → giữ thứ tự side-effect)
+        """
+        position = {s.step_number: i for i, s in enumerate(steps)}
+        producers: Dict[str, int] = {}
+        literals: Dict[str, List[int]] = {}
+        deps: Dict[int, Set[int]] = {}
+
+        for step in steps:
+            n = step.step_number
+            found = {c.step for c in (step.conditions or [])}
+
+            params = step.params or {}
+            text = " ".join(str(v) for v in params.values()) + " " + (step.description or "")
+            found.update(producers[var] for var in self.PLACEHOLDER.findall(text) if var in producers)
+
+            for value in params.values():
+                if isinstance(value, str) and not value.startswith("<"):
+                    found.update(literals.get(value, ()))
+                    literals.setdefault(value, []).append(n)
+
+            if step.store_result_as:
+                if step.store_result_as in producers:
+                    found.add(producers[step.store_result_as])
+                producers[step.store_result_as] = n
+
+            # Chỉ giữ dependency tới step đứng trước → luôn là DAG
+            deps[n] = {d for d in found if d in position and position[d] < position[n]}
+
+        return deps
+
+    async def run_sop_concurrent(self, sop: SOP) -> ExecutionStatus:
+        """
+        Mỗi step read-only bắt đầu ngay khi các step nó phụ thuộc hoàn thành (không chờ theo level).
+        Step dynamic, có side-effect hoặc có thể bị HITL dừng là barrier: chờ mọi step
+        trước nó xong, chạy 1 mình, step sau chỉ bắt đầu khi nó xong → thứ tự side-effect
+        giữ nguyên như chạy tuần tự, current_step_idx/steps khi PENDING_HITL cũng vậy.
+        """
+        ordered = [s.step_number for s in sop.steps]
+        deps = self.build_dependencies(sop.steps)
+        done: Dict[int, ToolResponse] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+
+        self.info("concurrent_execution", steps=len(ordered))
+
+        async def run_step(step: SOPStep, idx: int) -> ToolResponse:
+            pending = [tasks[d] for d in deps[step.step_number] if d in tasks]
+            if pending:
+                await asyncio.gather(*pending)
+
+            self.info("task_started", step=step.step_number, step_index=idx)
+            await self.middleware.dispatch("before_step", step, self.context)
+            resp = await self.execute_step_logged(step)
+            await self.middleware.dispatch("after_step", step, resp, self.context)
+
+            self.step_results[step.step_number] = resp
+            done[step.step_number] = resp
+            self.info("task_completed", step=step.step_number, success=resp.success)
+            return resp
+
+        def results_before(idx: int) -> List[ToolResponse]:
+            return [done[n] for n in ordered[:idx]]
+
+        async def drain():
+            """Chờ các step đang chạy; trả về ExecutionStatus nếu không thể tiếp tục."""
+            try:
+                if tasks:
+                    await asyncio.gather(*tasks.values())
+            except HITLRequired as hitl:
+                # Middleware không khai báo may_interrupt nhưng vẫn dừng step → không resume được
+                self.error(
+                    "hitl_in_concurrent_step",
+                    tool=hitl.tool_name,
+                    severity="FATAL"
+                )
+                return ExecutionStatus(
+                    state=ExecutionState.FAILED,
+                    error=f"HITL required for '{hitl.tool_name}' inside a concurrent step",
+                    steps=[done[n] for n in ordered if n in done],
+                    context=self.context,
+                )
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+                tasks.clear()
+            return None
+
+        for idx, step in enumerate(sop.steps):
+            if self.is_read_only(step) and not self.may_interrupt(step):
+                tasks[step.step_number] = asyncio.create_task(run_step(step, idx))
+                continue
+
+            # Barrier: chờ toàn bộ step trước đó rồi chạy 1 mình
+            failed = await drain()
+            if failed:
+                return failed
+
+            try:
+                await run_step(step, idx)
+            except HITLRequired as hitl:
+                self.warning(
+                    "hitl_required",
+                    step=step.step_number,
+                    tool=hitl.tool_name,
+                    reason=hitl.reason,
+                    severity="ESCALATE"
+                )
+                return ExecutionStatus(
+                    state=ExecutionState.PENDING_HITL,
+                    tool_name=hitl.tool_name,
+                    params=hitl.params,
+                    reason=hitl.reason,
+                    current_step_idx=idx,
+                    steps=results_before(idx),
+                    context=self.context,
+                )
+
+        failed = await drain()
+        if failed:
+            return failed
+
+        results = results_before(len(ordered))
+        resolved = self.resolve_template(sop.final_target)
+        await self.middleware.dispatch("after_run", self.context, resolved)
+
+        return ExecutionStatus(
+            state=ExecutionState.DONE,
+            result=resolved,
+            steps=results,
+            context=self.context,
+        )
@@ -1,4 +1,13 @@
-from src.constants.constants import PROMPT_TEMPLATES
+from src.constants.constants import get_prompt_templates
 
-PLANNER_PROMPT = PROMPT_TEMPLATES['planner_prompt']
-SOP_PROMPT = PROMPT_TEMPLATES['sop_prompt']
\ No newline at end of file
+_TEMPLATE_KEYS = {
+    "PLANNER_PROMPT": "planner_prompt",
+    "SOP_PROMPT": "sop_prompt",
+}
+
+
+def __getattr__(name):
+    # PEP 562: PLANNER_PROMPT/SOP_PROMPT chỉ load YAML khi được truy cập lần đầu
+    if name in _TEMPLATE_KEYS:
+        return get_prompt_templates()[_TEMPLATE_KEYS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
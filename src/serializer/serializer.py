@@ -1,7 +1,7 @@
-import json
 import re
 from typing import Any, Type
 from pydantic import BaseModel, ValidationError
+from src.utils.helper import json_loads, try_json_loads
 
 
 class SmartSerializer:
@@ -37,11 +37,8 @@ class SmartSerializer:
     # --------------------
     @staticmethod
     def try_parse_json(text: str):
-        text = text.strip()
-        try:
-            return json.loads(text)
-        except:
-            return None
+        # Text không bắt đầu bằng '{' / '[' → bỏ qua, không tốn 1 exception
+        return try_json_loads(text.strip())
 
     # --------------------
     # STACK-BASED JSON EXTRACT
@@ -53,23 +50,18 @@ class SmartSerializer:
             return None
 
         stack = 0
-        buf = ""
-        in_json = False
 
-        for ch in text[start:]:
+        for i in range(start, len(text)):
+            ch = text[i]
             if ch == "{":
                 stack += 1
-                in_json = True
-
-            if in_json:
-                buf += ch
-
-            if ch == "}":
+            elif ch == "}":
                 stack -= 1
                 if stack == 0:
+                    # Slice 1 lần thay vì nối từng ký tự vào buffer
                     try:
-                        return json.loads(buf)
-                    except:
+                        return json_loads(text[start:i + 1])
+                    except ValueError:
                         return None
 
         return None
@@ -149,7 +141,8 @@ class SmartSerializer:
             return None
 
         try:
-            return model(**data)
+            # model_validate: validate thẳng từ dict, không qua unpack kwargs
+            return model.model_validate(data)
         except ValidationError as e:
             print(f"Validation error: {e}")
             return None
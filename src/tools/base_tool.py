@@ -58,6 +58,8 @@ class BaseTool(LoggerMixin):
     registry = {}        # {"create_file": func}
     metadata = {}        # {"create_file": {...}}
     groups = defaultdict(list)  # {"file": ["create_file", "delete_file"]}
+    _discovered = set()  # package đã auto_discover, registry ở trên đã đầy
+    _group_callables = {}  # cache category -> [func], reset khi có tool mới
 
     def __init__(self, name=None, log_dir="logs"):
         super().__init__(name or self.__class__.__name__, log_dir)
@@ -107,6 +109,7 @@ class BaseTool(LoggerMixin):
 
             # add to grouping
             cls.groups[category].append(tool_name)
+            cls._group_callables.pop(category, None)
 
             return wrapper
 
@@ -116,6 +119,12 @@ class BaseTool(LoggerMixin):
     def get_tool(cls, name: str):
         return cls.registry.get(name)
 
+    @classmethod
+    def get_tools(cls, names: list[str]) -> list:
+        """Lấy nhiều tool 1 lần, giữ đúng thứ tự names (None nếu không tồn tại)."""
+        registry = cls.registry
+        return [registry.get(name) for name in names]
+
     @classmethod
     def list_tools(cls):
         """Trả về list tool_name."""
@@ -135,6 +144,18 @@ class BaseTool(LoggerMixin):
         """Trả về tool thuộc group."""
         return cls.groups.get(group_name, [])
 
+    @classmethod
+    def get_callables_by_group(cls, group_name: str) -> list:
+        """
+        Trả về các tool function (đã resolve) thuộc group, cache theo group.
+        Truyền thẳng vào agent.register_tool → không phải tra registry lần nữa.
+        """
+        funcs = cls._group_callables.get(group_name)
+        if funcs is None:
+            funcs = cls.get_tools(cls.get_tools_by_group(group_name))
+            cls._group_callables[group_name] = funcs
+        return list(funcs)
+
     @classmethod
     def get_all_tools_grouped(cls):
         """
@@ -299,10 +320,16 @@ class BaseTool(LoggerMixin):
         """
         Quét package và tự động import module chứa tool.
         Điều này kích hoạt decorator và registry sẽ tự đầy.
+        Chỉ quét 1 lần mỗi package trong process, các lần gọi sau là no-op.
         """
+        if package_name in cls._discovered:
+            return
+
         package = importlib.import_module(package_name)
 
         for loader, module_name, is_pkg in pkgutil.walk_packages(
             package.__path__, package.__name__ + "."
         ):
             importlib.import_module(module_name)
+
+        cls._discovered.add(package_name)
@@ -0,0 +1,99 @@
+"""
+Async memoize cho các coroutine gọi LLM (in-memory, theo process).
+
+- TTL + giới hạn số entry (LRU)
+- Dogpile protection: các call cùng key chạy đồng thời dùng chung 1 task,
+  chỉ 1 LLM round-trip được thực hiện. Mọi caller (kể cả caller đầu tiên) chờ
+  qua shield: 1 caller bị cancel không kéo theo những caller khác; task chung
+  chỉ bị huỷ khi không còn ai chờ
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from src.utils.helper import json_dumps
+
+
+def stable_hash(*parts: Any) -> str:
+    """Hash ổn định cho input dạng dict/list lồng nhau (dùng làm cache key)."""
+    raw = json_dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def async_memoize(
+    key: Callable[..., Hashable],
+    ttl: float = 3600,
+    maxsize: int = 1024,
+    cache_if: Optional[Callable[[Any], bool]] = None,
+):
+    """
+    key: nhận đúng các tham số của hàm được wrap, trả về cache key
+         (None → bỏ qua cache, gọi thẳng hàm)
+    cache_if: chỉ cache kết quả thỏa điều kiện (vd: bỏ qua response lỗi)
+    """
+
+    def decorator(func):
+        cache: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        inflight: Dict[Hashable, asyncio.Task] = {}
+        # task chung → số caller đang chờ
+        consumers: Dict[asyncio.Task, int] = {}
+
+        def _store(k: Hashable, task: asyncio.Task):
+            inflight.pop(k, None)
+            if task.cancelled() or task.exception() is not None:
+                return
+
+            result = task.result()
+            if cache_if is not None and not cache_if(result):
+                return
+
+            cache[k] = (time.monotonic() + ttl, result)
+            cache.move_to_end(k)
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+
+        async def _await_shared(task: asyncio.Task):
+            consumers[task] = consumers.get(task, 0) + 1
+            try:
+                return await asyncio.shield(task)
+            finally:
+                remaining = consumers[task] - 1
+                if remaining:
+                    consumers[task] = remaining
+                else:
+                    del consumers[task]
+                    # Caller cuối cùng bị cancel → không ai cần kết quả nữa
+                    if not task.done():
+                        task.cancel()
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs)
+            if k is None:
+                return await func(*args, **kwargs)
+
+            hit = cache.get(k)
+            if hit is not None:
+                if hit[0] > time.monotonic():
+                    cache.move_to_end(k)
+                    return hit[1]
+                del cache[k]
+
+            # Đã có call cùng key đang chạy → chờ chung, không gọi LLM lần nữa
+            task = inflight.get(k)
+            if task is None:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                inflight[k] = task
+                task.add_done_callback(lambda t: _store(k, t))
+            return await _await_shared(task)
+
+        def cache_clear():
+            cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
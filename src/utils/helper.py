@@ -1,8 +1,19 @@
 import yaml
+import json
+from functools import lru_cache
 from typing import Any
 import os
 import re
 
+# orjson nhanh hơn stdlib json 2-5x; thiếu package → fallback về json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# LibYAML (C) loader nhanh hơn SafeLoader thuần Python ~5-10x nếu PyYAML build kèm libyaml
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 def load_yaml(path: str) -> Any:
     """
     Đọc file YAML và trả về dữ liệu Python.
@@ -10,35 +21,100 @@ def load_yaml(path: str) -> Any:
     """
     try:
         with open(path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
+            return yaml.load(f, Loader=_YAML_LOADER)
     except FileNotFoundError:
         raise FileNotFoundError(f"YAML file not found: {path}")
     except yaml.YAMLError as e:
         raise ValueError(f"Invalid YAML format in file {path}: {e}")
 
+@lru_cache(maxsize=32)
+def _load_config_cached(path: str, mtime: float) -> Any:
+    return load_yaml(path)
+
+def load_config(path: str) -> Any:
+    """
+    Load YAML config, cache trong memory theo (path, mtime):
+    file được sửa → mtime đổi → parse lại, không dùng data cũ.
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        # Để load_yaml báo lỗi file không tồn tại như cũ
+        return load_yaml(path)
+    return _load_config_cached(path, mtime)
+
 def get_env(key: str, default=None):
     value = os.getenv(key, default)
     if value is None:
         raise ValueError(f"Environment variable '{key}' is missing")
     return value
 
+def json_loads(data: str | bytes) -> Any:
+    """Parse JSON (str/bytes). Lỗi luôn là ValueError như json.loads."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def try_json_loads(text: str) -> Any:
+    """
+    Parse nếu text trông như JSON (bắt đầu bằng '{' hoặc '['), ngược lại trả None.
+    Output dạng văn xuôi của LLM không phải đi qua exception.
+    """
+    if text[:1] not in ("{", "["):
+        return None
+    try:
+        return json_loads(text)
+    except ValueError:
+        return None
+
+def json_dumps(obj: Any, *, indent: bool = False, sort_keys: bool = False, default=None) -> str:
+    """Serialize JSON, giữ nguyên ký tự non-ASCII (ensure_ascii=False)."""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: chấp nhận key int/... như stdlib json
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option).decode()
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        sort_keys=sort_keys,
+        default=default,
+    )
+
 import re
 
-def validate_sop(sop: dict, available_agents: dict) -> tuple[bool, str]:
-    import re
+# Field bắt buộc của mỗi step — khớp với SOPStep model
+_SOP_STEP_REQUIRED_FIELDS = (
+    "step_number", "description", "agent_type",
+    "execution_mode", "action_type", "params",
+    "conditions", "retry", "store_result_as",
+    "condition_to_jump_step"
+)
 
-    # -------------------------------------------------------
-    # Normalize available_agents → {AgentName: {tools{}}}
-    # -------------------------------------------------------
+# <var> hoặc <var>.field
+_SOP_PARAM_REF = re.compile(r"^<([a-zA-Z_][a-zA-Z0-9_]*)(?:\.([a-zA-Z_][a-zA-Z0-9_]*))?>$")
+
+def normalize_available_agents(available_agents) -> dict:
+    """list-of-dicts → {AgentName: {tools{}}}; dict giữ nguyên."""
     if isinstance(available_agents, list):
         flat = {}
         for item in available_agents:
             if isinstance(item, dict):
                 flat.update(item)
-        available_agents = flat
+        return flat
+    return available_agents
 
+def validate_sop(sop: dict, available_agents: dict) -> tuple[bool, str]:
+    """
+    available_agents: {AgentName: {"tools": {...}}} như SOPStepDispatcher build sẵn.
+    Dạng list-of-dicts cũ → normalize_available_agents trước khi gọi.
+    """
     if not isinstance(available_agents, dict):
-        return False, "available_agents must be dict or list-of-dicts"
+        return False, "available_agents must be dict (see normalize_available_agents)"
 
     # -------------------------------------------------------
     # Must have steps
@@ -72,14 +148,7 @@ def validate_sop(sop: dict, available_agents: dict) -> tuple[bool, str]:
     for idx, step in enumerate(steps, start=1):
 
         # Required fields MUST exist exactly as in your SOPStep model
-        required_fields = [
-            "step_number", "description", "agent_type",
-            "execution_mode", "action_type", "params",
-            "conditions", "retry", "store_result_as",
-            "condition_to_jump_step"
-        ]
-
-        for field in required_fields:
+        for field in _SOP_STEP_REQUIRED_FIELDS:
             if field not in step:
                 return False, f"Missing required field '{field}' in step {idx}"
 
@@ -132,10 +201,7 @@ def validate_sop(sop: dict, available_agents: dict) -> tuple[bool, str]:
                 return False, f"invalid param syntax '{val}' in step {idx}"
 
             # match <var> or <var>.field
-            m = re.match(
-                r"^<([a-zA-Z_][a-zA-Z0-9_]*)(?:\.([a-zA-Z_][a-zA-Z0-9_]*))?>$",
-                val
-            )
+            m = _SOP_PARAM_REF.match(val)
             if m:
                 var = m.group(1)
                 field = m.group(2)
@@ -5,6 +5,50 @@ from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from typing import Any, Dict, Optional
 
+# "jsonl" (mặc định) hoặc "msgpack" → file log ghi dạng msgpack (.mpack)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "jsonl").lower()
+
+
+class MsgpackRotatingFileHandler(RotatingFileHandler):
+    """
+    Ghi payload của record dạng msgpack (self-delimiting, không cần newline).
+    Payload được truyền qua `extra={"payload": ...}` từ LoggerMixin._log;
+    record từ logger stdlib/third-party không có payload → dựng payload tối thiểu.
+    """
+
+    def __init__(self, filename: str, maxBytes: int = 0, backupCount: int = 0):
+        import msgpack  # optional dependency, chỉ cần khi LOG_FORMAT=msgpack
+
+        self._packer = msgpack.Packer()
+        # RotatingFileHandler ép mode "a" (text) khi maxBytes > 0 → mở trễ rồi chuyển sang binary
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, delay=True)
+        self.mode = "ab"
+        self.encoding = None
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        return self.maxBytes > 0 and self.stream.tell() >= self.maxBytes
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            payload = getattr(record, "payload", None)
+            if payload is None:
+                payload = {
+                    "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
+                    "level": record.levelname,
+                    "event": record.getMessage(),
+                    "component": record.name,
+                }
+            self.stream.write(self._packer.pack(payload))
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
 
 class LoggerMixin:
     def __init__(
@@ -42,6 +86,10 @@ class LoggerMixin:
     # -------------------------
 
     def _log(self, level: int, event: str, meta: Dict[str, Any]):
+        # Level bị tắt → bỏ qua luôn, không tốn công build payload
+        if not self.logger.isEnabledFor(level):
+            return
+
         payload = {
             "timestamp": datetime.utcnow().isoformat(),
             "level": logging.getLevelName(level),
@@ -61,7 +109,11 @@ class LoggerMixin:
             if v is not None:
                 payload[k] = v
 
-        self.logger.log(level, json.dumps(payload, ensure_ascii=False))
+        self.logger.log(
+            level,
+            json.dumps(payload, ensure_ascii=False),
+            extra={"payload": payload},
+        )
 
     # -------------------------
     # LOGGER SETUP
@@ -87,18 +139,20 @@ class LoggerMixin:
         logger.addHandler(console_handler)
 
         # File (rotating)
-        log_file = os.path.join(
-            self.log_dir,
-            f"{name.replace('.', '_')}.log"
-        )
-
-        file_handler = RotatingFileHandler(
-            log_file,
-            maxBytes=5 * 1024 * 1024,
-            backupCount=3,
-            encoding="utf-8",
-        )
-        file_handler.setFormatter(formatter)
+        if LOG_FORMAT == "msgpack":
+            file_handler = MsgpackRotatingFileHandler(
+                os.path.join(self.log_dir, f"{name.replace('.', '_')}.mpack"),
+                maxBytes=5 * 1024 * 1024,
+                backupCount=3,
+            )
+        else:
+            file_handler = RotatingFileHandler(
+                os.path.join(self.log_dir, f"{name.replace('.', '_')}.log"),
+                maxBytes=5 * 1024 * 1024,
+                backupCount=3,
+                encoding="utf-8",
+            )
+            file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
 
         logger._configured = True
@@ -4,13 +4,19 @@ Chạy: uvicorn src.web.log_viewer:app --reload
 Truy cập: http://localhost:8000
 """
 import os
-import json
-import glob
+import gzip
+import time
+import asyncio
+import heapq
+import orjson
+from collections import Counter, deque
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple
 from datetime import datetime
-from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, ConfigDict
 
@@ -26,50 +32,157 @@ class LogEntry(BaseModel):
     execution_id: Optional[str] = None
 
 
+# Entry được lưu dạng tuple lúc ingest để filter/sort đọc theo index:
+# (timestamp, LEVEL, component, event_lowercase, raw_entry)
+# level/event được chuẩn hóa 1 lần ở đây, filter chỉ còn so sánh trực tiếp.
+LogRecord = Tuple[str, str, str, str, Dict[str, Any]]
+RAW = 4
+
+# .log = JSONL, .mpack = msgpack (LOG_FORMAT=msgpack trong src/utils/logger.py)
+LOG_SUFFIXES = (".log", ".mpack")
+
+
 class LogViewer:
     """Service để đọc và parse logs."""
-    
+
+    # Số entry tối đa giữ trong cache cho mỗi file
+    MAX_CACHED_ENTRIES = 100000
+    # Thời gian (giây) giữ kết quả liệt kê thư mục log
+    FILE_LIST_TTL = 1.0
+
     def __init__(self, log_dir: str = "logs"):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
+        # filename -> {"ino", "size", "mtime", "offset", "entries", "total", counters...}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._files: List[str] = []
+        self._files_at = float("-inf")
     
     def get_log_files(self) -> List[str]:
         """Lấy danh sách tất cả log files."""
-        pattern = str(self.log_dir / "*.log")
-        files = glob.glob(pattern)
-        return [Path(f).name for f in files]
+        now = time.monotonic()
+        if now - self._files_at < self.FILE_LIST_TTL:
+            return self._files
+
+        with os.scandir(self.log_dir) as it:
+            self._files = [
+                e.name for e in it
+                if e.name.endswith(LOG_SUFFIXES) and e.is_file(follow_symlinks=False)
+            ]
+        self._files_at = now
+        return self._files
     
     def parse_log_file(self, filename: str, limit: int = 1000) -> List[Dict[str, Any]]:
-        """Parse một log file và trả về list các log entries."""
+        """Parse một log file và trả về list các log entries (mới nhất trước)."""
         filepath = self.log_dir / filename
         if not filepath.exists():
+            self._cache.pop(filename, None)
             return []
-        
-        entries = []
+
+        records = self._refresh_file(filename, filepath)
+        return [r[RAW] for r in islice(reversed(records), limit)]
+
+    def _refresh_file(self, filename: str, filepath: Path) -> deque:
+        """
+        Đọc incremental: chỉ parse phần bytes mới được append từ lần đọc trước.
+        File bị rotate/truncate → đọc lại từ đầu.
+        """
+        try:
+            st = filepath.stat()
+        except OSError:
+            self._cache.pop(filename, None)
+            return deque()
+
+        cache = self._cache.get(filename)
+        if (
+            cache
+            and cache["ino"] == st.st_ino
+            and cache["size"] == st.st_size
+            and cache["mtime"] == st.st_mtime
+        ):
+            return cache["entries"]
+
+        if cache is None or cache["ino"] != st.st_ino or st.st_size < cache["offset"]:
+            cache = {
+                "ino": st.st_ino,
+                "offset": 0,
+                "entries": deque(maxlen=self.MAX_CACHED_ENTRIES),
+                # Statistics được cộng dồn khi ingest, không phải đếm lại mỗi request
+                "total": 0,
+                "components": Counter(),
+                "levels": Counter(),
+                "events": Counter(),
+            }
+            self._cache[filename] = cache
+
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        entry = json.loads(line)
-                        # Đảm bảo entry là dict
-                        if isinstance(entry, dict):
-                            entries.append(entry)
-                    except json.JSONDecodeError:
-                        # Skip invalid JSON lines
-                        continue
-                    
-                    if len(entries) >= limit:
-                        break
+            with open(filepath, "rb") as f:
+                f.seek(cache["offset"])
+                data = f.read()
         except Exception as e:
             print(f"Error reading {filename}: {e}")
-        
-        # Sort by timestamp (newest first)
-        entries.sort(key=lambda x: x.get("timestamp", "") if isinstance(x, dict) else "", reverse=True)
-        return entries
+            return cache["entries"]
+
+        if filename.endswith(".mpack"):
+            entries, consumed = self._decode_msgpack(data)
+        else:
+            entries, consumed = self._decode_jsonl(data)
+
+        for entry in entries:
+            # Đảm bảo entry là dict
+            if isinstance(entry, dict):
+                cache["entries"].append((
+                    entry.get("timestamp", ""),
+                    str(entry.get("level", "")).upper(),
+                    entry.get("component", ""),
+                    str(entry.get("event", "")).lower(),
+                    entry,
+                ))
+                cache["total"] += 1
+                cache["components"][entry.get("component", "unknown")] += 1
+                cache["levels"][entry.get("level", "unknown")] += 1
+                cache["events"][entry.get("event", "unknown")] += 1
+
+        cache["offset"] += consumed
+        cache["size"] = st.st_size
+        cache["mtime"] = st.st_mtime
+        return cache["entries"]
+
+    @staticmethod
+    def _decode_jsonl(data: bytes) -> Tuple[List[Any], int]:
+        """Decode JSONL; trả về (objects, số bytes đã tiêu thụ)."""
+        # Dòng cuối chưa ghi xong (không có newline) → để lần sau đọc tiếp
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                entries.append(orjson.loads(line))
+            except ValueError:
+                # Skip invalid JSON lines
+                continue
+        return entries, end
+
+    @staticmethod
+    def _decode_msgpack(data: bytes) -> Tuple[List[Any], int]:
+        """Decode stream msgpack (LOG_FORMAT=msgpack); object dở dang để lần sau."""
+        import msgpack  # optional dependency, chỉ cần khi có file .mpack
+
+        unpacker = msgpack.Unpacker(raw=False, max_buffer_size=max(len(data), 1024 * 1024))
+        unpacker.feed(data)
+        entries = []
+        consumed = 0
+        try:
+            for obj in unpacker:
+                entries.append(obj)
+                consumed = unpacker.tell()
+        except ValueError:
+            # Dữ liệu hỏng → bỏ phần còn lại của lần đọc này
+            consumed = len(data)
+        return entries, consumed
     
     def get_all_logs(
         self,
@@ -80,435 +193,155 @@ class LogViewer:
         limit: int = 1000
     ) -> List[Dict[str, Any]]:
         """Lấy tất cả logs với filters."""
-        all_entries = []
-        
-        for filename in self.get_log_files():
-            entries = self.parse_log_file(filename, limit=limit)
-            all_entries.extend(entries)
-        
-        # Apply filters
+        matches = self.build_filter(component, level, event, segment_id)
+
+        # Mỗi file đã theo thứ tự ghi → reversed là newest-first; merge K stream
+        # thay vì sort lại, filter lazy và dừng ngay khi đủ `limit` entries
+        per_file = [
+            reversed(self._refresh_file(filename, self.log_dir / filename))
+            for filename in self.get_log_files()
+        ]
+        merged = heapq.merge(*per_file, key=itemgetter(0), reverse=True)
+        return [r[RAW] for r in islice(filter(matches, merged), limit)]
+
+    @staticmethod
+    def build_filter(
+        component: Optional[str] = None,
+        level: Optional[str] = None,
+        event: Optional[str] = None,
+        segment_id: Optional[str] = None,
+    ) -> Callable[[LogRecord], bool]:
+        """
+        Chuẩn hóa filters 1 lần và trả về predicate dùng cho từng record.
+        Chỉ các filter đang bật mới được kiểm tra: không filter → predicate
+        hằng True, 1 filter → dùng thẳng check đó, không rẽ nhánh mỗi entry.
+        """
+        checks: List[Callable[[LogRecord], bool]] = []
         if component:
-            all_entries = [e for e in all_entries if e.get("component") == component]
-        
+            checks.append(lambda r: r[2] == component)
         if level:
-            all_entries = [e for e in all_entries if e.get("level") == level.upper()]
-        
+            lvl = level.upper()
+            checks.append(lambda r: r[1] == lvl)
         if event:
-            all_entries = [e for e in all_entries if event.lower() in e.get("event", "").lower()]
-        
+            ev = event.lower()
+            checks.append(lambda r: ev in r[3])
         if segment_id:
-            all_entries = [e for e in all_entries if e.get("segment_id") == segment_id or e.get("execution_id") == segment_id]
-        
-        # Sort by timestamp (newest first)
-        all_entries.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        
-        return all_entries[:limit]
+            checks.append(
+                lambda r: r[RAW].get("segment_id") == segment_id
+                or r[RAW].get("execution_id") == segment_id
+            )
+
+        if not checks:
+            return lambda r: True
+        if len(checks) == 1:
+            return checks[0]
+        if len(checks) == 2:
+            first, second = checks
+            return lambda r: first(r) and second(r)
+
+        def matches(record: LogRecord) -> bool:
+            return all(check(record) for check in checks)
+
+        return matches
+
+    def tail(
+        self, filename: str, cursor: Optional[Tuple[int, int]] = None
+    ) -> Tuple[List[LogRecord], Tuple[int, int]]:
+        """
+        Trả về (records mới theo thứ tự ghi, cursor mới) kể từ cursor lần trước.
+        cursor = (inode, số entry đã ingest); file bị rotate → trả về từ đầu file mới.
+        """
+        records = self._refresh_file(filename, self.log_dir / filename)
+        cache = self._cache.get(filename)
+        if not cache:
+            return [], (0, 0)
+
+        new_cursor = (cache["ino"], cache["total"])
+        if cursor is None or cursor[0] != cache["ino"] or cursor[1] > cache["total"]:
+            seen = 0
+        else:
+            seen = cursor[1]
+
+        count = min(cache["total"] - seen, len(records))
+        return list(islice(records, len(records) - count, None)), new_cursor
     
     def get_stats(self) -> Dict[str, Any]:
         """Lấy statistics về logs."""
-        all_entries = self.get_all_logs(limit=10000)
-        
-        components = {}
-        levels = {}
-        events = {}
-        
-        for entry in all_entries:
-            comp = entry.get("component", "unknown")
-            level = entry.get("level", "unknown")
-            event_name = entry.get("event", "unknown")
-            
-            components[comp] = components.get(comp, 0) + 1
-            levels[level] = levels.get(level, 0) + 1
-            events[event_name] = events.get(event_name, 0) + 1
+        total = 0
+        components = Counter()
+        levels = Counter()
+        events = Counter()
+
+        log_files = self.get_log_files()
+        for filename in log_files:
+            self._refresh_file(filename, self.log_dir / filename)
+            cache = self._cache.get(filename)
+            if not cache:
+                continue
+
+            total += cache["total"]
+            components.update(cache["components"])
+            levels.update(cache["levels"])
+            events.update(cache["events"])
         
         return {
-            "total_logs": len(all_entries),
-            "components": components,
-            "levels": levels,
-            "top_events": dict(sorted(events.items(), key=lambda x: x[1], reverse=True)[:10]),
-            "log_files": len(self.get_log_files())
+            "total_logs": total,
+            "components": dict(components),
+            "levels": dict(levels),
+            "top_events": dict(events.most_common(10)),
+            "log_files": len(log_files)
         }
 
 
+# HTML interface được đọc 1 lần lúc import và tái sử dụng cho mọi request
+STATIC_DIR = Path(__file__).parent / "static"
+_INDEX_HTML = (STATIC_DIR / "index.html").read_text(encoding="utf-8")
+_INDEX_HEADERS = {"Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+_INDEX_RESPONSE = HTMLResponse(content=_INDEX_HTML, headers=_INDEX_HEADERS)
+# Nén sẵn 1 lần lúc import, không nén lại mỗi request
+_INDEX_GZ_RESPONSE = HTMLResponse(
+    content=gzip.compress(_INDEX_HTML.encode("utf-8"), compresslevel=9),
+    headers={**_INDEX_HEADERS, "Content-Encoding": "gzip"},
+)
+
+# JSON response lớn hơn ngưỡng này (bytes) sẽ được gzip nếu client hỗ trợ
+GZIP_MIN_SIZE = 4096
+
+# Chu kỳ (giây) kiểm tra entries mới cho WebSocket tail
+TAIL_INTERVAL = 0.5
+
 # Initialize FastAPI app
 app = FastAPI(title="Log Viewer", description="Web interface để xem logs của My-AI-Assistant")
 viewer = LogViewer()
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+
+def _accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def _json_response(request: Request, content: Any) -> Response:
+    """ORJSON response, gzip khi payload lớn và client chấp nhận."""
+    body = orjson.dumps(content)
+    if len(body) <= GZIP_MIN_SIZE or not _accepts_gzip(request):
+        return Response(content=body, media_type="application/json")
+
+    return Response(
+        content=gzip.compress(body, compresslevel=6),
+        media_type="application/json",
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
 
 
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
     """Main page với HTML interface."""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Log Viewer - My-AI-Assistant</title>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background: #1e1e1e;
-                color: #d4d4d4;
-                padding: 20px;
-            }
-            .header {
-                background: #252526;
-                padding: 20px;
-                border-radius: 8px;
-                margin-bottom: 20px;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }
-            h1 { color: #4ec9b0; }
-            .controls {
-                background: #252526;
-                padding: 15px;
-                border-radius: 8px;
-                margin-bottom: 20px;
-                display: flex;
-                gap: 10px;
-                flex-wrap: wrap;
-            }
-            select, input, button {
-                padding: 8px 12px;
-                background: #3c3c3c;
-                border: 1px solid #555;
-                border-radius: 4px;
-                color: #d4d4d4;
-                font-size: 14px;
-            }
-            button {
-                background: #007acc;
-                cursor: pointer;
-                border: none;
-            }
-            button:hover { background: #0098ff; }
-            .stats {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-                margin-bottom: 20px;
-            }
-            .stat-card {
-                background: #252526;
-                padding: 15px;
-                border-radius: 8px;
-                border-left: 4px solid #007acc;
-            }
-            .stat-value { font-size: 24px; font-weight: bold; color: #4ec9b0; }
-            .stat-label { color: #858585; font-size: 12px; margin-top: 5px; }
-            .logs-container {
-                background: #252526;
-                border-radius: 8px;
-                padding: 15px;
-                overflow-x: auto;
-            }
-            table {
-                width: 100%;
-                border-collapse: collapse;
-                font-family: 'Consolas', monospace;
-                font-size: 13px;
-            }
-            thead {
-                background: #1e1e1e;
-                position: sticky;
-                top: 0;
-                z-index: 10;
-            }
-            th {
-                padding: 12px;
-                text-align: left;
-                color: #9cdcfe;
-                font-weight: bold;
-                border-bottom: 2px solid #3c3c3c;
-                white-space: nowrap;
-            }
-            td {
-                padding: 10px 12px;
-                border-bottom: 1px solid #3c3c3c;
-                color: #d4d4d4;
-            }
-            tbody tr {
-                transition: background 0.2s;
-            }
-            tbody tr:hover {
-                background: #2d2d30;
-            }
-            .log-level {
-                padding: 4px 8px;
-                border-radius: 3px;
-                font-size: 11px;
-                font-weight: bold;
-                display: inline-block;
-                min-width: 60px;
-                text-align: center;
-            }
-            .log-level.INFO { background: #4ec9b0; color: #1e1e1e; }
-            .log-level.WARNING { background: #dcdcaa; color: #1e1e1e; }
-            .log-level.ERROR { background: #f48771; color: #1e1e1e; }
-            .log-level.DEBUG { background: #858585; color: #1e1e1e; }
-            .log-timestamp { 
-                color: #858585; 
-                font-size: 12px;
-                white-space: nowrap;
-            }
-            .log-component { 
-                color: #9cdcfe; 
-                font-weight: bold;
-            }
-            .log-event { 
-                color: #dcdcaa;
-            }
-            .log-meta {
-                color: #858585;
-                font-size: 11px;
-                max-width: 400px;
-                overflow: hidden;
-                text-overflow: ellipsis;
-                white-space: nowrap;
-            }
-            .log-meta-expanded {
-                white-space: normal;
-                word-break: break-all;
-                max-width: none;
-            }
-            .log-meta-key { 
-                color: #9cdcfe; 
-            }
-            .loading { 
-                text-align: center; 
-                padding: 20px; 
-                color: #858585; 
-            }
-            .expand-btn {
-                background: #007acc;
-                border: none;
-                color: white;
-                padding: 2px 6px;
-                border-radius: 3px;
-                cursor: pointer;
-                font-size: 10px;
-                margin-left: 5px;
-            }
-            .expand-btn:hover {
-                background: #0098ff;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>📊 Log Viewer - My-AI-Assistant</h1>
-            <button onclick="refreshLogs()">🔄 Refresh</button>
-        </div>
-        
-        <div class="controls">
-            <select id="componentFilter">
-                <option value="">All Components</option>
-            </select>
-            <select id="levelFilter">
-                <option value="">All Levels</option>
-                <option value="DEBUG">DEBUG</option>
-                <option value="INFO">INFO</option>
-                <option value="WARNING">WARNING</option>
-                <option value="ERROR">ERROR</option>
-            </select>
-            <input type="text" id="eventFilter" placeholder="Filter by event...">
-            <input type="text" id="segmentIdFilter" placeholder="Filter by segment_id...">
-            <input type="number" id="limitInput" value="100" min="10" max="1000" placeholder="Limit">
-            <button onclick="loadLogs()">🔍 Filter</button>
-            <button onclick="loadStats()">📈 Stats</button>
-        </div>
-        
-        <div class="stats" id="stats"></div>
-        
-        <div class="logs-container">
-            <div class="loading">Loading logs...</div>
-        </div>
-        
-        <script>
-            async function loadLogs() {
-                const component = document.getElementById('componentFilter').value;
-                const level = document.getElementById('levelFilter').value;
-                const event = document.getElementById('eventFilter').value;
-                const segmentId = document.getElementById('segmentIdFilter').value;
-                const limit = document.getElementById('limitInput').value || 100;
-                
-                const params = new URLSearchParams({ limit });
-                if (component) params.append('component', component);
-                if (level) params.append('level', level);
-                if (event) params.append('event', event);
-                if (segmentId) params.append('segment_id', segmentId);
-                
-                const response = await fetch(`/api/logs?${params}`);
-                const logs = await response.json();
-                
-                renderLogs(logs);
-            }
-            
-            async function loadStats() {
-                const response = await fetch('/api/stats');
-                const stats = await response.json();
-                renderStats(stats);
-            }
-            
-            async function loadComponents() {
-                const response = await fetch('/api/stats');
-                const stats = await response.json();
-                const select = document.getElementById('componentFilter');
-                select.innerHTML = '<option value="">All Components</option>';
-                Object.keys(stats.components || {}).forEach(comp => {
-                    const option = document.createElement('option');
-                    option.value = comp;
-                    option.textContent = `${comp} (${stats.components[comp]})`;
-                    select.appendChild(option);
-                });
-            }
-            
-            function renderStats(stats) {
-                const container = document.getElementById('stats');
-                container.innerHTML = `
-                    <div class="stat-card">
-                        <div class="stat-value">${stats.total_logs}</div>
-                        <div class="stat-label">Total Logs</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-value">${stats.log_files}</div>
-                        <div class="stat-label">Log Files</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-value">${Object.keys(stats.components || {}).length}</div>
-                        <div class="stat-label">Components</div>
-                    </div>
-                `;
-            }
-            
-            function renderLogs(logs) {
-                const container = document.querySelector('.logs-container');
-                if (logs.length === 0) {
-                    container.innerHTML = '<div class="loading">No logs found</div>';
-                    return;
-                }
-                
-                // Tạo table HTML
-                let tableHTML = `
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Timestamp</th>
-                                <th>Level</th>
-                                <th>Component</th>
-                                <th>Event</th>
-                                <th>Step</th>
-                                <th>Tool</th>
-                                <th>Severity</th>
-                                <th>Error</th>
-                                <th>Segment ID</th>
-                                <th>Other Metadata</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                `;
-                
-                logs.forEach((log, index) => {
-                    const level = log.level || 'INFO';
-                    const timestamp = log.timestamp || '';
-                    const component = log.component || 'unknown';
-                    const event = log.event || 'no-event';
-                    const step = log.step !== undefined ? log.step : '-';
-                    const tool = log.tool || '-';
-                    const severity = log.severity || '-';
-                    const error = log.error || '-';
-                    const segmentId = log.segment_id || log.execution_id || '-';
-                    
-                    // Lấy metadata khác (tất cả fields trừ các fields đã hiển thị)
-                    const displayedKeys = ['timestamp', 'level', 'event', 'component', 'execution_id', 'segment_id', 'step', 'tool', 'severity', 'error', 'step_index', 'agent_type', 'execution_mode', 'attempt'];
-                    const metaKeys = Object.keys(log)
-                        .filter(k => !displayedKeys.includes(k));
-                    
-                    let metaHTML = '';
-                    if (metaKeys.length > 0) {
-                        const metaObj = {};
-                        metaKeys.forEach(k => metaObj[k] = log[k]);
-                        metaHTML = `<div class="log-meta" id="meta-${index}">${formatMetadata(metaObj)}</div>`;
-                        if (JSON.stringify(metaObj).length > 100) {
-                            metaHTML += `<button class="expand-btn" onclick="toggleExpand(${index})">Expand</button>`;
-                        }
-                    } else {
-                        metaHTML = '<div class="log-meta">-</div>';
-                    }
-                    
-                    tableHTML += `
-                        <tr>
-                            <td class="log-timestamp">${timestamp}</td>
-                            <td><span class="log-level ${level}">${level}</span></td>
-                            <td class="log-component">${component}</td>
-                            <td class="log-event">${event}</td>
-                            <td>${step}</td>
-                            <td>${tool}</td>
-                            <td>${severity}</td>
-                            <td>${error}</td>
-                            <td>${segmentId}</td>
-                            <td>${metaHTML}</td>
-                        </tr>
-                    `;
-                });
-                
-                tableHTML += `
-                        </tbody>
-                    </table>
-                `;
-                
-                container.innerHTML = tableHTML;
-            }
-            
-            function formatMetadata(meta) {
-                return Object.keys(meta)
-                    .map(k => `<span class="log-meta-key">${k}:</span> ${formatValue(meta[k])}`)
-                    .join(', ');
-            }
-            
-            function formatValue(value) {
-                if (value === null || value === undefined) return 'null';
-                if (typeof value === 'object') {
-                    return JSON.stringify(value);
-                }
-                return String(value);
-            }
-            
-            function toggleExpand(index) {
-                const metaEl = document.getElementById(`meta-${index}`);
-                if (metaEl) {
-                    metaEl.classList.toggle('log-meta-expanded');
-                    const btn = metaEl.nextElementSibling;
-                    if (btn) {
-                        btn.textContent = metaEl.classList.contains('log-meta-expanded') ? 'Collapse' : 'Expand';
-                    }
-                }
-            }
-            
-            function refreshLogs() {
-                loadLogs();
-                loadStats();
-            }
-            
-            // Auto-refresh every 5 seconds
-            setInterval(refreshLogs, 5000);
-            
-            // Initial load
-            loadComponents();
-            loadStats();
-            loadLogs();
-        </script>
-    </body>
-    </html>
-    """
+    return _INDEX_GZ_RESPONSE if _accepts_gzip(request) else _INDEX_RESPONSE
 
 
 @app.get("/api/logs")
 async def get_logs(
+    request: Request,
     component: Optional[str] = Query(None),
     level: Optional[str] = Query(None),
     event: Optional[str] = Query(None),
@@ -523,31 +356,102 @@ async def get_logs(
         segment_id=segment_id,
         limit=limit
     )
-    return JSONResponse(content=logs)
+    return _json_response(request, logs)
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    """Đọc (và bỏ qua) message từ client tới khi client ngắt kết nối."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@app.websocket("/ws/logs")
+async def tail_logs(
+    websocket: WebSocket,
+    component: Optional[str] = None,
+    level: Optional[str] = None,
+    event: Optional[str] = None,
+    segment_id: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """
+    WebSocket đẩy các log entries mới (đã lọc) tới client.
+    `since` = timestamp mới nhất client đã có (từ /api/logs hoặc batch trước):
+    lần đẩy đầu gửi bù các entries ghi sau mốc đó, không mất entries giữa
+    lúc lấy snapshot và lúc kết nối.
+    """
+    await websocket.accept()
+    matches = viewer.build_filter(component, level, event, segment_id)
+
+    if since:
+        # Đọc lại từ đầu mỗi file, chỉ giữ entries có timestamp > since
+        cursors: Dict[str, Tuple[int, int]] = {}
+    else:
+        # Không có mốc → chỉ gửi entries ghi sau thời điểm kết nối
+        cursors = {filename: viewer.tail(filename)[1] for filename in viewer.get_log_files()}
+
+    # Vòng poll không tự gọi receive → task riêng phát hiện client ngắt kết nối
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        while True:
+            new_records = []
+            for filename in viewer.get_log_files():
+                records, cursors[filename] = viewer.tail(filename, cursors.get(filename))
+                new_records.extend(
+                    r for r in records if matches(r) and (since is None or r[0] > since)
+                )
+            since = None
+
+            if new_records:
+                new_records.sort(key=itemgetter(0))
+                await websocket.send_text(orjson.dumps([r[RAW] for r in new_records]).decode())
+
+            done, _ = await asyncio.wait({disconnected}, timeout=TAIL_INTERVAL)
+            if done:
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
 
 
 @app.get("/api/stats")
 async def get_stats():
     """API endpoint để lấy statistics."""
     stats = viewer.get_stats()
-    return JSONResponse(content=stats)
+    return ORJSONResponse(content=stats)
 
 
 @app.get("/api/files")
 async def get_log_files():
     """API endpoint để lấy danh sách log files."""
     files = viewer.get_log_files()
-    return JSONResponse(content={"files": files})
+    return ORJSONResponse(content={"files": files})
 
 
 @app.get("/api/file/{filename}")
-async def get_file_logs(filename: str, limit: int = Query(100, ge=1, le=1000)):
+async def get_file_logs(request: Request, filename: str, limit: int = Query(100, ge=1, le=1000)):
     """API endpoint để lấy logs từ một file cụ thể."""
     logs = viewer.parse_log_file(filename, limit=limit)
-    return JSONResponse(content=logs)
+    return _json_response(request, logs)
+
+
+def uvicorn_options() -> Dict[str, str]:
+    """
+    Dùng uvloop + httptools khi có (Linux/macOS, đi kèm uvicorn[standard]),
+    Windows hoặc thiếu package → để uvicorn tự chọn (asyncio/h11).
+    """
+    try:
+        import uvloop  # noqa: F401
+        import httptools  # noqa: F401
+    except ImportError:
+        return {"loop": "auto", "http": "auto"}
+    return {"loop": "uvloop", "http": "httptools"}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, **uvicorn_options())
 